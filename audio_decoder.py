@@ -0,0 +1,72 @@
+"""
+Decodificação de áudio para o formato dos modelos Whisper.
+
+Lê o arquivo baixado (OGG/Opus do Telegram e do WhatsApp, MP3, M4A...) e
+devolve direto um array float32 mono de 16 kHz, sem arquivo intermediário.
+A decodificação roda no próprio processo com o PyAV (já instalado junto com
+o faster-whisper); sem ele, cai no ffmpeg por pipe.
+"""
+
+import subprocess
+from typing import Optional
+
+import numpy as np
+
+SAMPLE_RATE = 16000  # taxa esperada pelos modelos Whisper
+
+def decode_audio(audio_path: str, start: float = 0.0, duration: Optional[float] = None) -> np.ndarray:
+    """Decodifica (um trecho de) um áudio para float32 mono 16 kHz"""
+    try:
+        import av
+    except ImportError:
+        return _decode_ffmpeg(audio_path, start, duration)
+    try:
+        return _decode_av(av, audio_path, start, duration)
+    except av.error.FFmpegError as e:
+        raise RuntimeError(f"Falha ao decodificar áudio: {e}") from e
+
+def _decode_av(av, audio_path: str, start: float, duration: Optional[float]) -> np.ndarray:
+    resampler = av.AudioResampler(format="s16", layout="mono", rate=SAMPLE_RATE)
+    end = start + duration if duration is not None else None
+    chunks = []
+    first = None  # instante (s) da primeira amostra decodificada
+
+    with av.open(audio_path, metadata_errors="ignore") as container:
+        if not container.streams.audio:
+            raise RuntimeError(f"Arquivo sem faixa de áudio: {audio_path}")
+        stream = container.streams.audio[0]
+        if start:
+            # Vai para o ponto de acesso anterior a `start`; o excesso é cortado abaixo
+            container.seek(int(start / stream.time_base), stream=stream)
+
+        for frame in container.decode(stream):
+            if first is None:
+                first = float(frame.time) if frame.time is not None else 0.0
+            if end is not None and frame.time is not None and frame.time > end:
+                break
+            for resampled in resampler.resample(frame):
+                chunks.append(resampled.to_ndarray().reshape(-1))
+        for resampled in resampler.resample(None):
+            chunks.append(resampled.to_ndarray().reshape(-1))
+
+    if not chunks:
+        return np.zeros(0, np.float32)
+    audio = np.concatenate(chunks).astype(np.float32) / 32768.0
+
+    skip = max(0, int(round((start - (first or 0.0)) * SAMPLE_RATE)))
+    if duration is None:
+        return audio[skip:]
+    return audio[skip:skip + int(duration * SAMPLE_RATE)]
+
+def _decode_ffmpeg(audio_path: str, start: float, duration: Optional[float]) -> np.ndarray:
+    cmd = ["ffmpeg", "-nostdin", "-threads", "0"]
+    if start:
+        cmd += ["-ss", str(start)]
+    if duration is not None:
+        cmd += ["-t", str(duration)]
+    cmd += ["-i", audio_path, "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "-"]
+    try:
+        output = subprocess.run(cmd, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Falha ao decodificar áudio: {e.stderr.decode(errors='ignore')}") from e
+    return np.frombuffer(output, np.int16).astype(np.float32) / 32768.0
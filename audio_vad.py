@@ -0,0 +1,87 @@
+"""
+Detecção de voz (VAD) por energia, aplicada antes do Whisper.
+
+Gravações de campo têm pausas longas enquanto o técnico manuseia o
+equipamento. Os trechos de silêncio são cortados e um SpeechMap guarda onde
+cada trecho mantido estava no áudio original, para devolver os tempos dos
+segmentos na escala original.
+"""
+
+from bisect import bisect_right
+from typing import List, Tuple
+
+import numpy as np
+
+from config import VAD_MIN_SILENCE, VAD_PADDING
+
+FRAME_SECONDS = 0.03
+MARGIN_DB = 12.0  # acima do ruído de fundo estimado
+FLOOR_DB = -50.0  # nunca considerar voz abaixo disso
+
+class SpeechMap:
+    """Mapa de tempos do áudio cortado -> áudio original (em segundos)"""
+
+    def __init__(self, spans: List[Tuple[float, float]], offset: float = 0.0):
+        self.spans = [(start + offset, end + offset) for start, end in spans]  # trechos mantidos, no original
+        self.starts = []  # início de cada trecho no áudio cortado
+        position = 0.0
+        for start, end in self.spans:
+            self.starts.append(position)
+            position += end - start
+        self.kept = position
+
+    def to_original(self, seconds: float) -> float:
+        if not self.spans:
+            return seconds
+        index = max(0, bisect_right(self.starts, seconds) - 1)
+        start, end = self.spans[index]
+        return min(end, start + seconds - self.starts[index])
+
+def speech_spans(audio: np.ndarray, sample_rate: int, min_silence: float = VAD_MIN_SILENCE,
+                 padding: float = VAD_PADDING) -> List[Tuple[float, float]]:
+    """Trechos com voz (início, fim) em segundos; pausas menores que `min_silence` são mantidas"""
+    frame = int(sample_rate * FRAME_SECONDS)
+    frames = len(audio) // frame
+    if frames == 0:
+        return [(0.0, len(audio) / sample_rate)] if len(audio) else []
+
+    energy = np.sqrt(np.mean(audio[:frames * frame].reshape(frames, frame) ** 2, axis=1))
+    level = 20 * np.log10(energy + 1e-10)
+    noise, loud = np.percentile(level, [10, 90])
+    if loud - noise < MARGIN_DB:
+        # Sem contraste entre fundo e voz: ou é tudo fala, ou tudo silêncio
+        return [(0.0, len(audio) / sample_rate)] if loud > FLOOR_DB else []
+    threshold = max(noise + MARGIN_DB, FLOOR_DB)
+    voiced = np.concatenate(([False], level > threshold, [False]))
+
+    edges = np.flatnonzero(np.diff(voiced.astype(np.int8)))
+    runs = edges.reshape(-1, 2)  # [início, fim) de cada sequência de quadros com voz
+    if len(runs) == 0:
+        return []
+
+    gap = int(min_silence / FRAME_SECONDS)
+    pad = int(padding / FRAME_SECONDS)
+    merged = [list(runs[0])]
+    for start, end in runs[1:]:
+        if start - merged[-1][1] < gap + 2 * pad:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+
+    total = len(audio) / sample_rate
+    return [
+        (float(max(0, start - pad) * FRAME_SECONDS), float(min(total, (end + pad) * FRAME_SECONDS)))
+        for start, end in merged
+    ]
+
+def trim_silence(audio: np.ndarray, sample_rate: int, offset: float = 0.0) -> Tuple[np.ndarray, SpeechMap]:
+    """
+    Remove os silêncios do áudio.
+
+    Retorna o áudio só com os trechos de voz e o SpeechMap para converter os
+    tempos de volta (`offset` é o início do trecho dentro do arquivo).
+    """
+    spans = speech_spans(audio, sample_rate)
+    pieces = [audio[int(start * sample_rate):int(end * sample_rate)] for start, end in spans]
+    trimmed = np.concatenate(pieces) if pieces else audio[:0]
+    return trimmed, SpeechMap(spans, offset)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark de conexões abertas com a Bot API
+
+Sobe um servidor local que imita a Bot API e conta quantas conexões TCP são
+abertas para enviar N mensagens: `requests.post` por chamada (como antes)
+contra o cliente compartilhado `TelegramAPI` (pool keep-alive).
+"""
+
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from telegram_api import TelegramAPI
+
+TOKEN = "123:bench"
+
+class FakeBotAPI(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # permite keep-alive
+    wbufsize = -1  # resposta em um único write (evita atraso do Nagle)
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with FakeBotAPI.lock:
+            FakeBotAPI.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps({"ok": True, "result": {}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def run(label, send, messages, concurrency):
+    FakeBotAPI.connections = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(send, range(messages)))
+    elapsed = time.perf_counter() - start
+    per_thousand = FakeBotAPI.connections * 1000 / messages
+    print(f"{label:>16}: {FakeBotAPI.connections:5d} conexões "
+          f"({per_thousand:7.1f} por 1.000 mensagens) em {elapsed:6.2f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Conexões abertas por mensagem enviada")
+    parser.add_argument("--messages", type=int, default=1000, help="mensagens enviadas")
+    parser.add_argument("--concurrency", type=int, default=8, help="envios simultâneos")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeBotAPI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def send_plain(i):
+        requests.post(f"{api_url}/bot{TOKEN}/sendMessage", json={"chat_id": i, "text": "ok"})
+
+    api = TelegramAPI(TOKEN, api_url=api_url)
+
+    def send_pooled(i):
+        api.call("sendMessage", json={"chat_id": i, "text": "ok"})
+
+    print("🔌 BENCHMARK DE CONEXÕES")
+    print("=" * 50)
+    run("requests.post", send_plain, args.messages, args.concurrency)
+    run("TelegramAPI", send_pooled, args.messages, args.concurrency)
+
+    api.close()
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
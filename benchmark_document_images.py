@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark das imagens pré-dimensionadas no PDF
+
+Monta o mesmo MIP com N passos de duas formas: como era antes (a imagem
+processada inteira, esticada em 400x300 pontos) e com as cópias de
+image_derivatives (tamanho exato da caixa a DOCUMENT_IMAGE_DPI, proporção
+mantida). Mede o tamanho do PDF e o tempo de geração, com as cópias ainda por
+fazer (frio) e já em cache (quente).
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
+
+from benchmark_screenshot_classifier import synthetic_samples
+from config import DOCUMENT_IMAGE_DPI
+from image_derivatives import derivative
+from image_processor import ImageProcessor
+
+def stretched(path):
+    return Image(path, width=400, height=300)
+
+def presized(path):
+    image_path, width, height = derivative(path, "pdf")
+    return Image(image_path, width=width, height=height)
+
+def build_pdf(images, pdf_path, flowable):
+    styles = getSampleStyleSheet()
+    start = time.perf_counter()
+    doc = SimpleDocTemplate(str(pdf_path), pagesize=letter)
+    elements = []
+    for i, path in enumerate(images, 1):
+        elements.append(Paragraph(f"{i}. Passo do procedimento", styles["Normal"]))
+        elements.append(Spacer(1, 12))
+        elements.append(flowable(path))
+        elements.append(Spacer(1, 12))
+    doc.build(elements)
+    return pdf_path.stat().st_size, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Tamanho e tempo do PDF com imagens pré-dimensionadas")
+    parser.add_argument("--steps", type=int, default=30, help="passos (imagens) no MIP")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print("📄 BENCHMARK DE IMAGENS NO PDF")
+    print("=" * 80)
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(tmp)
+        processor = ImageProcessor()
+        sources = synthetic_samples(folder, (args.steps + 1) // 2, args.seed)[:args.steps]
+        images = [
+            processor.process_image(str(path), str(folder / f"processed_image_{index}.jpg"))
+            for index, (path, _) in enumerate(sources)
+        ]
+        print(f"{len(images)} passos, cópias a {DOCUMENT_IMAGE_DPI} DPI")
+
+        cases = [
+            ("imagem inteira", stretched),
+            ("cópias (frio)", presized),
+            ("cópias (quente)", presized)
+        ]
+        for index, (name, flowable) in enumerate(cases):
+            size, seconds = build_pdf(images, folder / f"mip_{index}.pdf", flowable)
+            print(f"{name:>16}: PDF {size / 1024:8.0f} KB | geração {seconds:6.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark da escolha de formato no ImageProcessor
+
+Compara o JPEG único de antes (qualidade 85 para tudo) com a escolha atual
+(PNG com paleta para screenshots, JPEG para fotos, e opcionalmente um limite
+de bytes por imagem): tamanho das imagens, tempo de processamento e tamanho
+do PDF montado como no DocumentGenerator do main.py (e do DOCX, se o
+python-docx estiver instalado), com as cópias de image_derivatives. O DOCX
+mantém o formato escolhido; o PDF recebe sempre JPEG.
+
+Usa as imagens de --samples (qualquer pasta) ou o conjunto sintético do
+benchmark do classificador de screenshots.
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import SimpleDocTemplate, Spacer, Image
+
+from benchmark_screenshot_classifier import IMAGE_EXTENSIONS, prepared, synthetic_samples
+from image_derivatives import derivative
+from image_processor import ImageProcessor, classify_screenshot
+
+class JpegOnlyProcessor(ImageProcessor):
+    """Comportamento anterior: sempre JPEG na qualidade padrão"""
+
+    def _encode(self, img, is_screenshot):
+        return '.jpg', self._encode_jpeg(img, self.quality)
+
+def build_pdf(images, pdf_path):
+    doc = SimpleDocTemplate(str(pdf_path), pagesize=letter)
+    elements = []
+    for path in images:
+        image_path, width, height = derivative(path, "pdf")
+        elements.append(Image(image_path, width=width, height=height))
+        elements.append(Spacer(1, 12))
+    doc.build(elements)
+    return pdf_path.stat().st_size
+
+def build_docx(images, docx_path):
+    try:
+        from docx import Document
+        from docx.shared import Pt
+    except ImportError:
+        return None
+    document = Document()
+    for path in images:
+        image_path, width, height = derivative(path, "docx")
+        document.add_picture(image_path, width=Pt(width), height=Pt(height))
+    document.save(str(docx_path))
+    return docx_path.stat().st_size
+
+def run(name, processor, samples, folder):
+    folder.mkdir()
+    outputs = []
+    start = time.perf_counter()
+    for index, (path, is_screenshot) in enumerate(samples):
+        result = processor.process_image(str(path), str(folder / f"imagem_{index}.jpg"))
+        outputs.append((result, is_screenshot))
+    elapsed = time.perf_counter() - start
+
+    sizes = {True: 0, False: 0}
+    for result, is_screenshot in outputs:
+        sizes[is_screenshot] += Path(result).stat().st_size
+    images = [result for result, _ in outputs]
+    pngs = sum(result.endswith(".png") for result in images)
+    pdf = build_pdf(images, folder / "mip.pdf")
+    docx = build_docx(images, folder / "mip.docx")
+
+    docx_text = f"{docx / 1024:7.0f} KB" if docx is not None else "não instalado"
+    print(f"{name:>16}: screenshots {sizes[True] / 1024:7.0f} KB | fotos {sizes[False] / 1024:7.0f} KB | "
+          f"{pngs:2d} PNG | {elapsed / len(samples) * 1000:5.0f} ms/imagem | "
+          f"PDF {pdf / 1024:7.0f} KB | DOCX {docx_text}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Tamanho das imagens e dos documentos por formato")
+    parser.add_argument("--samples", help="pasta com imagens (padrão: conjunto sintético)")
+    parser.add_argument("--count", type=int, default=10, help="imagens sintéticas de cada tipo")
+    parser.add_argument("--budget", type=int, default=150_000, help="limite de bytes por imagem no modo com limite")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print("🗜️ BENCHMARK DE FORMATO DAS IMAGENS")
+    print("=" * 120)
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.samples:
+            samples = [(path, None) for path in sorted(Path(args.samples).rglob("*"))
+                       if path.suffix.lower() in IMAGE_EXTENSIONS]
+        else:
+            samples = synthetic_samples(Path(tmp), args.count, args.seed)
+        if not samples:
+            parser.error(f"nenhuma imagem em {args.samples}")
+
+        # Sem rótulo (--samples), separa pelo próprio classificador
+        if args.samples:
+            samples = [(path, classify_screenshot(prepared(path))[0]) for path, _ in samples]
+
+        print(f"{len(samples)} imagens: {sum(label for _, label in samples)} screenshots, "
+              f"{sum(not label for _, label in samples)} fotos")
+        run("JPEG único", JpegOnlyProcessor(byte_budget=0), samples, Path(tmp) / "jpeg")
+        run("por conteúdo", ImageProcessor(byte_budget=0), samples, Path(tmp) / "conteudo")
+        run(f"limite {args.budget // 1000} KB", ImageProcessor(byte_budget=args.budget), samples, Path(tmp) / "limite")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Benchmark de decodificação de JPEG reduzida (draft) no ImageProcessor
+
+Compara a decodificação completa seguida de LANCZOS (como era antes) com o
+ImageProcessor atual, que decodifica o JPEG já reduzido no domínio DCT e gira
+a imagem depois de reduzir. Cada execução roda em um subprocesso próprio para
+medir CPU e pico de memória (RSS) isoladamente.
+
+Além dos arquivos originais, mede cópias ampliadas para 12 MP (tamanho de
+foto de celular), onde a diferença aparece de fato.
+
+Os dois lados medem só decodificar, reduzir, girar e gravar em JPEG: no
+ImageProcessor a classificação de screenshot fica desligada e a gravação é
+sempre JPEG (a escolha de formato tem benchmark próprio, benchmark_image_codecs).
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image
+
+IMAGES = ["teste rf.jpg", "teste rf2.jpg", "assets/exemplo2.jpg"]
+PHONE_SIZE = (4032, 3024)  # 12 MP
+
+def full_decode(input_path, output_path, max_width=1200, max_height=800):
+    """Caminho anterior: decodifica tudo, gira e só então reduz"""
+    with Image.open(input_path) as img:
+        img.load()
+        orientation = img.getexif().get(274)
+        if orientation == 3:
+            img = img.rotate(180, expand=True)
+        elif orientation == 6:
+            img = img.rotate(270, expand=True)
+        elif orientation == 8:
+            img = img.rotate(90, expand=True)
+        width, height = img.size
+        if width > max_width or height > max_height:
+            ratio = min(max_width/width, max_height/height)
+            img = img.resize((int(width * ratio), int(height * ratio)), Image.Resampling.LANCZOS)
+        img.save(output_path, 'JPEG', quality=85, optimize=True)
+    return output_path
+
+def draft_processor():
+    """ImageProcessor só com decodificação, redução e rotação (sempre JPEG, sem classificar)"""
+    import image_processor
+
+    class JpegOnlyProcessor(image_processor.ImageProcessor):
+        def _encode(self, img, is_screenshot):
+            return '.jpg', self._encode_jpeg(img, self.quality)
+
+    # Tudo é tratado como foto: sem classificação nem ajuste de contraste e nitidez
+    image_processor.classify_screenshot = lambda img: (False, 0.0)
+    return JpegOnlyProcessor().process_image
+
+def peak_rss_mb() -> float:
+    """
+    Pico de memória do processo. No Linux usa o VmHWM, que zera no exec (o
+    ru_maxrss herda o pico do processo pai, que gerou as imagens de 12 MP).
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def worker(mode, input_path, repeat):
+    """Roda dentro do subprocesso e imprime as medidas em JSON"""
+    # O import do image_processor fica fora da medida de memória
+    process = full_decode if mode == "completo" else draft_processor()
+    baseline_rss = peak_rss_mb()
+    with tempfile.TemporaryDirectory() as tmp:
+        start_cpu = time.process_time()
+        for _ in range(repeat):
+            output_path = process(input_path, str(Path(tmp) / "saida.jpg"))
+        cpu = (time.process_time() - start_cpu) / repeat
+        if output_path is None:
+            raise SystemExit(f"falha ao processar {input_path}")
+        with Image.open(output_path) as result:
+            size = result.size
+    peak = peak_rss_mb()
+    print(json.dumps({
+        "cpu_ms": cpu * 1000,
+        "peak_rss_mb": peak,
+        "delta_rss_mb": peak - baseline_rss,
+        "size": size
+    }))
+
+def measure(mode, input_path, repeat):
+    output = subprocess.run(
+        [sys.executable, __file__, "--worker", mode, str(input_path), "--repeat", str(repeat)],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU e memória: decodificação completa vs draft")
+    parser.add_argument("--repeat", type=int, default=5, help="execuções por imagem (média de CPU)")
+    parser.add_argument("--no-phone-size", action="store_true", help="não medir as cópias de 12 MP")
+    parser.add_argument("--worker", nargs=2, metavar=("MODO", "IMAGEM"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker[0], args.worker[1], args.repeat)
+        return
+
+    print("🖼️ BENCHMARK DE DECODIFICAÇÃO DE JPEG")
+    print("=" * 86)
+    with tempfile.TemporaryDirectory() as tmp:
+        cases = [(name, Path(name)) for name in IMAGES]
+        if not args.no_phone_size:
+            for name in IMAGES:
+                phone_path = Path(tmp) / f"{Path(name).stem}_12mp.jpg"
+                with Image.open(name) as img:
+                    img.convert("RGB").resize(PHONE_SIZE, Image.Resampling.BICUBIC).save(phone_path, quality=92)
+                cases.append((f"{name} (12 MP)", phone_path))
+
+        for label, path in cases:
+            with Image.open(path) as img:
+                source_size = img.size
+            print(f"{label} {source_size[0]}x{source_size[1]}")
+            for mode in ("completo", "draft"):
+                result = measure(mode, path, args.repeat)
+                print(f"  {mode:>9}: CPU {result['cpu_ms']:7.1f} ms | pico RSS {result['peak_rss_mb']:6.1f} MB "
+                      f"(+{result['delta_rss_mb']:5.1f} MB) | saída {result['size'][0]}x{result['size'][1]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Benchmark do classificador de screenshots: acurácia vs custo
+
+Compara o método anterior (proporção de tela + duas chamadas a getcolors na
+imagem inteira) com o classify_screenshot atual (miniatura + histograma e
+bordas em NumPy) sobre um conjunto rotulado.
+
+Com --samples, usa uma pasta com as subpastas screenshot/ e foto/ (o nome da
+subpasta é o rótulo). Sem ela, gera um conjunto sintético: telas desenhadas
+(PNG e JPEG, paisagem e celular), as imagens de exemplo do repositório e
+"fotos" com gradientes, formas desfocadas e ruído de sensor. O conjunto
+sintético serve para comparar custo; a acurácia deve ser confirmada com
+imagens reais do campo.
+
+As imagens passam antes pelo mesmo redimensionamento do process_image, como
+no uso real; com --original, são classificadas na resolução original.
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+from image_processor import ImageProcessor, classify_screenshot
+
+REPO_SCREENSHOTS = ["teste rf.jpg", "teste rf2.jpg", "assets/exemplo2.jpg"]
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+LABELS = {"screenshot": True, "foto": False}
+
+def legacy_is_screenshot(img):
+    """Método anterior: proporção de monitor e menos de 1000 cores (duas passadas)"""
+    width, height = img.size
+    common_ratios = [1.77, 1.6, 1.33, 1.25]
+    img_ratio = width / height
+    is_common_ratio = any(abs(img_ratio - ratio) < 0.1 for ratio in common_ratios)
+    colors = len(img.getcolors(maxcolors=1000)) if img.getcolors(maxcolors=1000) else 1000
+    return is_common_ratio and colors < 1000
+
+def draw_screenshot(rng, size):
+    """Tela de sistema: barra de título, menu lateral, texto, tabela e botões"""
+    background = rng.choice([(255, 255, 255), (245, 246, 248), (30, 30, 30), (236, 240, 244)])
+    text = (20, 20, 20) if sum(background) > 300 else (220, 220, 220)
+    accent = rng.choice([(0, 84, 129), (33, 150, 243), (76, 175, 80), (230, 81, 0)])
+    width, height = size
+    img = Image.new("RGB", size, background)
+    draw = ImageDraw.Draw(img)
+
+    bar = max(24, height // 14)
+    draw.rectangle([0, 0, width, bar], fill=accent)
+    draw.text((12, bar // 3), "Painel ONT - Configuração WAN", fill=(255, 255, 255))
+    if width > height:
+        side = width // 6
+        draw.rectangle([0, bar, side, height], fill=tuple(max(0, c - 12) for c in background))
+        for i in range(8):
+            draw.text((14, bar + 20 + i * 26), f"Menu {i + 1}", fill=text)
+    else:
+        side = 0
+
+    y = bar + 20
+    while y < height - 40:
+        kind = rng.random()
+        if kind < 0.5:
+            draw.text((side + 20, y), "PPPoE usuario cliente@provedor  VLAN 100  " * 2, fill=text)
+            y += 22
+        elif kind < 0.75:
+            draw.rectangle([side + 20, y, side + 180, y + 28], fill=accent)
+            draw.text((side + 34, y + 8), "Salvar", fill=(255, 255, 255))
+            y += 44
+        else:
+            for row in range(4):
+                draw.rectangle([side + 20, y, width - 20, y + 22], outline=(200, 200, 200))
+                draw.text((side + 28, y + 5), f"Porta {row}   UP   1000M   {rng.randint(1, 99)}%", fill=text)
+                y += 22
+            y += 16
+    return img
+
+def draw_photo(rng, size):
+    """Foto sintética: iluminação, objetos desfocados, textura em várias escalas e ruído de sensor"""
+    width, height = size
+    base = np.array([rng.randint(40, 200) for _ in range(3)], np.float32)
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    light = 0.6 + 0.4 * (xx / width * rng.random() + yy / height * rng.random())
+    img = Image.fromarray(np.clip(base * light[..., None], 0, 255).astype(np.uint8))
+
+    draw = ImageDraw.Draw(img)
+    for _ in range(rng.randint(4, 12)):
+        x, y = rng.randint(0, width), rng.randint(0, height)
+        r = rng.randint(width // 20, width // 4)
+        color = tuple(rng.randint(0, 255) for _ in range(3))
+        if rng.random() < 0.5:
+            draw.ellipse([x - r, y - r, x + r, y + r], fill=color)
+        else:
+            draw.rectangle([x - r, y - r // 2, x + r, y + r // 2], fill=color)
+    img = img.filter(ImageFilter.GaussianBlur(width / rng.uniform(150, 600)))
+
+    noise = np.random.default_rng(rng.randint(0, 2**32))
+    pixels = np.asarray(img, np.float32)
+    texture = np.zeros((height, width), np.float32)
+    for cells in (8, 32, 128, 512):  # superfícies, folhagem, cabos, poeira...
+        layer = Image.fromarray(noise.normal(0, 1, (max(2, cells * height // width), cells)).astype(np.float32))
+        texture += np.asarray(layer.resize(size, Image.Resampling.BICUBIC)) * rng.uniform(4, 14)
+    pixels += texture[..., None] + noise.normal(0, rng.uniform(2, 6), pixels.shape).astype(np.float32)
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+def synthetic_samples(folder, count, seed):
+    rng = random.Random(seed)
+    screen_sizes = [(1920, 1080), (1366, 768), (1280, 800), (1080, 2340), (1080, 1920), (1600, 900)]
+    photo_sizes = [(2016, 1512), (1512, 2016), (1600, 1200), (1920, 1080), (1200, 1600)]
+    samples = []
+    for i in range(count):
+        path = folder / f"screenshot_{i}{'.png' if i % 2 else '.jpg'}"
+        draw_screenshot(rng, rng.choice(screen_sizes)).save(path, quality=rng.randint(70, 95))
+        samples.append((path, True))
+        path = folder / f"foto_{i}.jpg"
+        draw_photo(rng, rng.choice(photo_sizes)).save(path, quality=rng.randint(75, 92))
+        samples.append((path, False))
+    samples += [(Path(name), True) for name in REPO_SCREENSHOTS if Path(name).exists()]
+    return samples
+
+def labelled_samples(folder):
+    samples = []
+    for label, is_screenshot in LABELS.items():
+        for path in sorted((folder / label).rglob("*")):
+            if path.suffix.lower() in IMAGE_EXTENSIONS:
+                samples.append((path, is_screenshot))
+    return samples
+
+def prepared(path, original=False):
+    """Imagem como o process_image a entrega ao classificador (já reduzida)"""
+    processor = ImageProcessor()
+    with Image.open(path) as img:
+        if original:
+            return img.convert("RGB")
+        width, height = img.size
+        ratio = min(processor.max_width / width, processor.max_height / height, 1)
+        new_size = (int(width * ratio), int(height * ratio))
+        img.draft(img.mode, new_size)
+        img = img.convert("RGB")
+        return img.resize(new_size, Image.Resampling.LANCZOS) if img.size != new_size else img
+
+def evaluate(name, classify, images, repeat):
+    hits = {True: 0, False: 0}
+    totals = {True: 0, False: 0}
+    elapsed = 0.0
+    for img, label in images:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            predicted = classify(img)
+        elapsed += (time.perf_counter() - start) / repeat
+        totals[label] += 1
+        hits[label] += predicted == label
+
+    accuracy = (hits[True] + hits[False]) / len(images)
+    print(f"{name:>12}: acurácia {accuracy:6.1%} | screenshots {hits[True]}/{totals[True]} | "
+          f"fotos {hits[False]}/{totals[False]} | {elapsed / len(images) * 1000:6.2f} ms/imagem")
+
+def main():
+    parser = argparse.ArgumentParser(description="Acurácia e custo do classificador de screenshots")
+    parser.add_argument("--samples", help="pasta com subpastas screenshot/ e foto/")
+    parser.add_argument("--count", type=int, default=20, help="imagens sintéticas de cada tipo")
+    parser.add_argument("--repeat", type=int, default=5, help="execuções por imagem (média de tempo)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--original", action="store_true", help="classificar sem reduzir antes")
+    parser.add_argument("--verbose", action="store_true", help="mostrar a confiança de cada imagem")
+    args = parser.parse_args()
+
+    print("🖼️ BENCHMARK DO CLASSIFICADOR DE SCREENSHOTS")
+    print("=" * 86)
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.samples:
+            samples = labelled_samples(Path(args.samples))
+        else:
+            samples = synthetic_samples(Path(tmp), args.count, args.seed)
+        if not samples:
+            parser.error(f"nenhuma imagem rotulada em {args.samples}")
+        images = [(prepared(path, args.original), label) for path, label in samples]
+
+    origin = args.samples or "conjunto sintético"
+    print(f"{len(images)} imagens ({origin}, {'resolução original' if args.original else 'já reduzidas'}): "
+          f"{sum(label for _, label in images)} screenshots, {sum(not label for _, label in images)} fotos")
+    evaluate("anterior", legacy_is_screenshot, images, args.repeat)
+    evaluate("miniatura", lambda img: classify_screenshot(img)[0], images, args.repeat)
+
+    if args.verbose:
+        for (path, label), (img, _) in zip(samples, images):
+            is_screenshot, confidence = classify_screenshot(img)
+            mark = "✅" if is_screenshot == label else "❌"
+            print(f"  {mark} {path.name:<28} {'screenshot' if label else 'foto':>10} confiança {confidence:.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark de inicialização dos servidores
+
+Para cada ponto de entrada, sobe o uvicorn em um subprocesso e mede o tempo
+até a porta responder, e (com --ready) até o modelo de transcrição estar
+carregado em /health. Também confere se torch/whisper foram importados no
+processo web, o que não deve acontecer.
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import requests
+
+ENTRY_POINTS = ["telegram_server", "telegram_server_simple", "main"]
+
+SERVER = "import uvicorn, {module}; uvicorn.run({module}.app, host='127.0.0.1', port={port}, log_level='warning')"
+IMPORTS = "import sys, {module}; print(','.join(m for m in ('torch', 'whisper') if m in sys.modules) or '-')"
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_for(url, timeout, condition=lambda data: True):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            response = requests.get(url, timeout=1)
+            if response.status_code == 200 and condition(response.json()):
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.05)
+    return False
+
+def heavy_imports(module, env) -> str:
+    result = subprocess.run([sys.executable, "-c", IMPORTS.format(module=module)],
+                            env=env, capture_output=True, text=True)
+    return result.stdout.strip() or "erro"
+
+def measure(module, env, ready, timeout):
+    port = free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-c", SERVER.format(module=module, port=port)],
+                               env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        base = f"http://127.0.0.1:{port}"
+        online = wait_for(f"{base}/stats", timeout)
+        bind_time = time.perf_counter() - start if online else None
+
+        ready_time = None
+        if online and ready and module != "telegram_server_simple":
+            if wait_for(f"{base}/health", timeout, lambda data: data.get("transcription_ready")):
+                ready_time = time.perf_counter() - start
+        return bind_time, ready_time
+    finally:
+        process.terminate()
+        process.wait()
+
+def fmt(seconds):
+    return f"{seconds:7.2f}s" if seconds is not None else "      -"
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo até cada servidor aceitar requisições")
+    parser.add_argument("--runs", type=int, default=3, help="inicializações por ponto de entrada")
+    parser.add_argument("--ready", action="store_true", help="esperar também o modelo carregar")
+    parser.add_argument("--timeout", type=float, default=120, help="limite de espera em segundos")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("TELEGRAM_TOKEN", "123:bench")
+    env["TRANSCRIPTION_PRELOAD"] = "1" if args.ready else "0"
+
+    print("🚀 BENCHMARK DE INICIALIZAÇÃO")
+    print("=" * 60)
+    print(f"{'ponto de entrada':>24} {'porta':>8} {'modelo':>8}  torch/whisper")
+    for module in ENTRY_POINTS:
+        imports = heavy_imports(module, env)
+        for _ in range(args.runs):
+            bind_time, ready_time = measure(module, env, args.ready, args.timeout)
+            print(f"{module:>24} {fmt(bind_time)} {fmt(ready_time)}  {imports}")
+
+if __name__ == "__main__":
+    main()
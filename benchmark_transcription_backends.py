@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark de fator de tempo real (RTF) dos motores de transcrição
+
+Transcreve as mesmas gravações com cada motor e compara o tempo gasto com a
+duração do áudio (RTF = tempo de processamento / duração; abaixo de 1 é mais
+rápido que o tempo real). Usa os áudios de uploads/ por padrão. Com --vad,
+cada motor roda com e sem o corte de silêncio.
+"""
+
+import argparse
+import json
+import subprocess
+import time
+from pathlib import Path
+
+import transcription_backends
+from config import WHISPER_MODEL, TORCH_THREADS
+from transcription_backends import BACKENDS, load_backend
+
+AUDIO_EXTENSIONS = {".ogg", ".oga", ".mp3", ".m4a", ".wav", ".opus"}
+
+def audio_duration(audio_path: Path) -> float:
+    """Duração em segundos, lida com o ffprobe (instalado junto com o ffmpeg)"""
+    output = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "json", str(audio_path)],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return float(json.loads(output)["format"]["duration"])
+
+def run(backend_name, compute_type, model_name, threads, recordings, vad_modes):
+    start = time.perf_counter()
+    backend = load_backend(backend_name, model_name, threads, compute_type)
+    load_time = time.perf_counter() - start
+
+    backend.transcribe_batch([(str(recordings[0][0]), 0.0, None)])  # aquecimento
+
+    total_audio = sum(duration for _, duration in recordings)
+    for vad in vad_modes:
+        transcription_backends.VAD_ENABLED = vad
+        processing = 0.0
+        speech = 0.0
+        for audio_path, _ in recordings:
+            start = time.perf_counter()
+            result = backend.transcribe_batch([(str(audio_path), 0.0, None)])[0]
+            processing += time.perf_counter() - start
+            if isinstance(result, Exception):
+                raise result
+            speech += result["speech_seconds"]
+
+        label = f"{backend_name} ({compute_type}{', vad' if vad else ''})"
+        print(f"{label:>34}: RTF {processing / total_audio:5.3f} | "
+              f"{processing:7.2f}s para {total_audio:7.2f}s de áudio "
+              f"({total_audio - speech:6.2f}s de silêncio cortados) | carga {load_time:5.2f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="RTF de cada motor de transcrição")
+    parser.add_argument("--audio-dir", default="uploads", help="pasta com as gravações")
+    parser.add_argument("--model", default=WHISPER_MODEL, help="modelo (tiny, base, small...)")
+    parser.add_argument("--threads", type=int, default=TORCH_THREADS, help="threads da CPU")
+    parser.add_argument("--backends", nargs="+", default=["openai-whisper:float32", "faster-whisper:int8"],
+                        help=f"motor:compute_type (motores: {', '.join(BACKENDS)})")
+    parser.add_argument("--vad", action="store_true", help="comparar com e sem corte de silêncio")
+    args = parser.parse_args()
+
+    audio = sorted(p for p in Path(args.audio_dir).rglob("*") if p.suffix.lower() in AUDIO_EXTENSIONS)
+    if not audio:
+        parser.error(f"nenhum áudio encontrado em {args.audio_dir}")
+    recordings = [(audio_path, audio_duration(audio_path)) for audio_path in audio]
+
+    print("⏱️ BENCHMARK DE MOTORES DE TRANSCRIÇÃO")
+    print("=" * 80)
+    print(f"{len(recordings)} gravações, modelo {args.model}, {args.threads} thread(s)")
+
+    for spec in args.backends:
+        backend_name, _, compute_type = spec.partition(":")
+        try:
+            run(backend_name, compute_type or "int8", args.model, args.threads, recordings,
+                [False, True] if args.vad else [transcription_backends.VAD_ENABLED])
+        except ImportError as e:
+            print(f"{spec:>34}: não instalado ({e})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark de vazão da transcrição em lote
+
+Envia N áudios ao mesmo tempo para o TranscriptionService, como em um pico de
+mensagens de voz, e compara áudio por áudio (lote de 1) contra o agrupador
+(lotes de até --batch-size). A duração de cada gravação é informada como no
+Telegram: só as de até 30s entram em lote. Precisa do Whisper instalado e de
+gravações reais (por padrão, os áudios em uploads/).
+"""
+
+import argparse
+import statistics
+import time
+from itertools import cycle, islice
+from pathlib import Path
+
+from audio_decoder import SAMPLE_RATE, decode_audio
+from transcription_service import TranscriptionService
+
+AUDIO_EXTENSIONS = {".ogg", ".oga", ".mp3", ".m4a", ".wav", ".opus"}
+
+def find_audio(directory: Path):
+    return sorted(p for p in directory.rglob("*") if p.suffix.lower() in AUDIO_EXTENSIONS)
+
+def run(label, service, clips, durations):
+    service.submit(str(clips[0]), duration=durations[clips[0]]).result()  # aquece o worker (modelo carregado)
+    batches_before = service.batches
+
+    start = time.perf_counter()
+    submitted = {}
+    futures = []
+    for clip in clips:
+        future = service.submit(str(clip), duration=durations[clip])
+        submitted[future] = time.perf_counter()
+        futures.append(future)
+
+    latencies = []
+    for future in futures:
+        future.result()
+        latencies.append(time.perf_counter() - submitted[future])
+    elapsed = time.perf_counter() - start
+
+    batches = service.batches - batches_before
+    print(f"{label:>12}: {len(clips) / elapsed:6.2f} áudios/s | "
+          f"latência média {statistics.mean(latencies):6.2f}s | "
+          f"máx {max(latencies):6.2f}s | lote médio {len(clips) / batches:.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Vazão da transcrição: um por vez vs em lote")
+    parser.add_argument("--audio-dir", default="uploads", help="pasta com as gravações")
+    parser.add_argument("--clips", type=int, default=16, help="áudios enviados de uma vez")
+    parser.add_argument("--batch-size", type=int, default=8, help="tamanho máximo do lote")
+    parser.add_argument("--batch-wait", type=float, default=0.3, help="espera máxima para formar o lote (s)")
+    parser.add_argument("--workers", type=int, default=1, help="processos de transcrição")
+    args = parser.parse_args()
+
+    audio = find_audio(Path(args.audio_dir))
+    if not audio:
+        parser.error(f"nenhum áudio encontrado em {args.audio_dir}")
+    clips = list(islice(cycle(audio), args.clips))
+    durations = {path: len(decode_audio(str(path))) / SAMPLE_RATE for path in set(clips)}
+
+    print("🎙️ BENCHMARK DE TRANSCRIÇÃO EM LOTE")
+    print("=" * 70)
+    print(f"{len(clips)} áudios ({len(audio)} arquivos distintos), {args.workers} worker(s)")
+
+    for label, batch_size in (("um por vez", 1), ("em lote", args.batch_size)):
+        service = TranscriptionService(num_workers=args.workers, batch_size=batch_size, batch_wait=args.batch_wait)
+        try:
+            run(label, service, clips, durations)
+        finally:
+            service.shutdown()
+
+if __name__ == "__main__":
+    main()
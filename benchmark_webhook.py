@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Benchmark de latência do webhook do Telegram
+
+Compara o processamento inline (handler chamado dentro do endpoint) com o
+processamento em fila (TelegramWebhook + UpdateDispatcher) enquanto áudios
+estão sendo transcritos. A transcrição é simulada com um sleep bloqueante.
+O modo em fila passa pelo mesmo caminho do telegram_server.py (is_valid,
+is_duplicate e dispatch, com a espera pela resposta inline).
+"""
+
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from config import INLINE_REPLY_TIMEOUT
+from telegram_webhook import TelegramWebhook
+from update_dispatcher import UpdateDispatcher
+
+class SlowHandler:
+    """Handler que simula o custo de transcrever um áudio"""
+
+    def __init__(self, transcribe_seconds: float):
+        self.transcribe_seconds = transcribe_seconds
+
+    def transcribe(self, update):
+        if "voice" in update["message"]:
+            time.sleep(self.transcribe_seconds)
+        return "ok"
+
+    async def handle_message(self, update):
+        return await asyncio.to_thread(self.transcribe, update)
+
+    async def send_message(self, chat_id, text, parse_mode="HTML"):
+        return True
+
+def create_app(handler, mode: str, workers: int, reply_timeout: float):
+    app = FastAPI()
+    dispatcher = UpdateDispatcher(workers)
+    webhook = TelegramWebhook(handler, dispatcher, reply_timeout=reply_timeout)
+
+    @app.on_event("startup")
+    async def startup():
+        await dispatcher.start()
+
+    @app.on_event("shutdown")
+    async def shutdown():
+        await dispatcher.stop()
+
+    @app.post("/webhook/telegram")
+    async def telegram_webhook(request: Request):
+        update = await request.json()
+        if mode == "inline":
+            # Comportamento antigo: transcrição síncrona dentro do endpoint
+            handler.transcribe(update)
+            return JSONResponse(content={"status": "ok"})
+        if not webhook.is_valid(update):
+            return JSONResponse(content={"status": "ignored"})
+        if webhook.is_duplicate(update):
+            return JSONResponse(content={"status": "duplicate"})
+        return JSONResponse(content=await webhook.dispatch(update))
+
+    return app
+
+def make_update(update_id: int, chat_id: int, voice: bool):
+    message = {"message_id": update_id, "chat": {"id": chat_id}}
+    if voice:
+        message["voice"] = {"file_id": f"voice_{update_id}", "duration": 30}
+    else:
+        message["text"] = "/status"
+    return {"update_id": update_id, "message": message}
+
+def percentile(values, pct):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+def start_server(app, port: int):
+    """Sobe o uvicorn em uma thread e aguarda ele aceitar conexões"""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="error"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, thread
+
+def run_scenario(mode: str, args):
+    handler = SlowHandler(args.transcribe_seconds)
+    app = create_app(handler, mode, args.workers, args.reply_timeout)
+    server, thread = start_server(app, args.port)
+    url = f"http://127.0.0.1:{args.port}/webhook/telegram"
+
+    # Áudios chegando continuamente enquanto as mensagens de texto são medidas
+    stop = threading.Event()
+
+    def send_voices(offset: int):
+        with httpx.Client(timeout=None) as client:
+            update_id = offset
+            while not stop.is_set():
+                client.post(url, json=make_update(update_id, 1000 + offset, voice=True))
+                update_id += args.voices
+                stop.wait(args.transcribe_seconds)
+
+    voice_threads = [
+        threading.Thread(target=send_voices, args=(i,), daemon=True)
+        for i in range(args.voices)
+    ]
+    for voice_thread in voice_threads:
+        voice_thread.start()
+
+    latencies = []
+    with httpx.Client(timeout=None) as client:
+        for i in range(args.requests):
+            update = make_update(100_000 + i, 2000 + (i % 50), voice=False)
+            start = time.perf_counter()
+            client.post(url, json=update)
+            latencies.append(time.perf_counter() - start)
+            time.sleep(args.interval)
+
+    stop.set()
+    for voice_thread in voice_threads:
+        voice_thread.join()
+    server.should_exit = True
+    thread.join()
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de latência do webhook")
+    parser.add_argument("--requests", type=int, default=200, help="mensagens de texto medidas")
+    parser.add_argument("--voices", type=int, default=4, help="áudios transcrevendo em paralelo")
+    parser.add_argument("--transcribe-seconds", type=float, default=2.0, help="duração simulada da transcrição")
+    parser.add_argument("--interval", type=float, default=0.01, help="intervalo entre mensagens (s)")
+    parser.add_argument("--workers", type=int, default=4, help="workers do dispatcher")
+    parser.add_argument("--reply-timeout", type=float, default=INLINE_REPLY_TIMEOUT,
+                        help="espera máxima pela resposta inline (s)")
+    parser.add_argument("--port", type=int, default=8765, help="porta do servidor de teste")
+    args = parser.parse_args()
+
+    print("⏱️  BENCHMARK DO WEBHOOK")
+    print("=" * 50)
+    for mode in ("inline", "fila"):
+        latencies = run_scenario(mode, args)
+        ms = [value * 1000 for value in latencies]
+        print(f"{mode:>7}: p50={statistics.median(ms):8.2f}ms "
+              f"p99={percentile(ms, 99):8.2f}ms max={max(ms):8.2f}ms")
+
+if __name__ == "__main__":
+    main()
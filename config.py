@@ -9,6 +9,22 @@ load_dotenv()
 # Token do bot do Telegram (deve ser configurado via variável de ambiente)
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
 
+# Configurações do cliente da Bot API
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+TELEGRAM_POOL_SIZE = int(os.getenv("TELEGRAM_POOL_SIZE", 20))  # conexões keep-alive mantidas
+TELEGRAM_CONNECT_TIMEOUT = float(os.getenv("TELEGRAM_CONNECT_TIMEOUT", 5))  # segundos
+TELEGRAM_READ_TIMEOUT = float(os.getenv("TELEGRAM_READ_TIMEOUT", 30))  # segundos
+TELEGRAM_UPLOAD_TIMEOUT = float(os.getenv("TELEGRAM_UPLOAD_TIMEOUT", 120))  # envios/downloads de arquivos
+TELEGRAM_MAX_CONCURRENCY = int(os.getenv("TELEGRAM_MAX_CONCURRENCY", 20))  # requisições simultâneas à Bot API
+
+# Limites de envio da Bot API (mensagens por segundo)
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", 30))
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", 1))
+TELEGRAM_GROUP_RATE = float(os.getenv("TELEGRAM_GROUP_RATE", 20 / 60))  # 20 mensagens por minuto
+TELEGRAM_CHAT_BURST = int(os.getenv("TELEGRAM_CHAT_BURST", 3))  # rajada permitida por chat
+TELEGRAM_SEND_ATTEMPTS = int(os.getenv("TELEGRAM_SEND_ATTEMPTS", 5))  # tentativas após HTTP 429
+FILE_ID_CACHE_SIZE = int(os.getenv("FILE_ID_CACHE_SIZE", 1000))  # arquivos enviados lembrados por file_id
+
 # Configurações do servidor
 HOST = "0.0.0.0"
 PORT = 8000
@@ -19,9 +35,49 @@ LOG_LEVEL = "INFO"
 # Configurações de arquivos
 UPLOAD_DIR = "uploads"
 OUTPUT_DIR = "output"
+MAX_DOWNLOAD_BYTES = int(os.getenv("MAX_DOWNLOAD_BYTES", 20 * 1024 * 1024))  # limite por arquivo baixado
 
 # Configurações do Whisper
-WHISPER_MODEL = "base"
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
+WHISPER_DRAFT_MODEL = os.getenv("WHISPER_DRAFT_MODEL", "tiny")  # rascunho rápido antes do modelo principal ("" desativa)
+WHISPER_BACKEND = os.getenv("WHISPER_BACKEND", "openai-whisper")  # ou "faster-whisper" (CTranslate2)
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "int8")  # só faster-whisper: int8, int8_float32, float32
+TRANSCRIPTION_WORKERS = int(os.getenv("TRANSCRIPTION_WORKERS", 1))  # processos, cada um com o modelo carregado
+TORCH_THREADS = int(os.getenv("TORCH_THREADS", max(1, (os.cpu_count() or 1) // TRANSCRIPTION_WORKERS)))  # threads por worker (torch ou CTranslate2)
+# Carregar o modelo em segundo plano ao subir o servidor (0 = só no primeiro áudio)
+TRANSCRIPTION_PRELOAD = os.getenv("TRANSCRIPTION_PRELOAD", "1") == "1"
+# Áudios que chegam juntos são transcritos em lote (até N, esperando no máximo X segundos)
+TRANSCRIPTION_BATCH_SIZE = int(os.getenv("TRANSCRIPTION_BATCH_SIZE", 8))
+TRANSCRIPTION_BATCH_WAIT = float(os.getenv("TRANSCRIPTION_BATCH_WAIT", 0.3))
+# Transcrições já feitas (por file_unique_id/hash do áudio); 0 desativa o cache
+TRANSCRIPTION_CACHE_PATH = os.getenv("TRANSCRIPTION_CACHE_PATH", "cache/transcriptions.sqlite3")
+TRANSCRIPTION_CACHE_SIZE = int(os.getenv("TRANSCRIPTION_CACHE_SIZE", 5000))
+# Áudios mais longos que uma janela são transcritos por partes, com resultado parcial no chat
+TRANSCRIPTION_WINDOW_SECONDS = int(os.getenv("TRANSCRIPTION_WINDOW_SECONDS", 30))
+TRANSCRIPTION_EDIT_INTERVAL = float(os.getenv("TRANSCRIPTION_EDIT_INTERVAL", 3.0))  # mínimo entre edições da mensagem
+# Fila de transcrição: áudios curtos primeiro, com envelhecimento para os longos não esperarem para sempre
+TRANSCRIPTION_AGING_RATE = float(os.getenv("TRANSCRIPTION_AGING_RATE", 2.0))  # segundos de áudio "descontados" por segundo de espera
+TRANSCRIPTION_DEFAULT_DURATION = float(os.getenv("TRANSCRIPTION_DEFAULT_DURATION", 60))  # quando a duração não é informada
+# Corte de silêncio antes do Whisper (pausas maiores que VAD_MIN_SILENCE segundos)
+VAD_ENABLED = os.getenv("VAD_ENABLED", "1") == "1"
+VAD_MIN_SILENCE = float(os.getenv("VAD_MIN_SILENCE", 0.6))
+VAD_PADDING = float(os.getenv("VAD_PADDING", 0.2))  # margem mantida em volta de cada trecho de voz
+
+# Processamento de imagens (processos em paralelo)
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", os.cpu_count() or 1))
+IMAGE_BYTE_BUDGET = int(os.getenv("IMAGE_BYTE_BUDGET", 0))  # bytes por imagem (0 = sem limite, qualidade fixa)
+# Cópias no tamanho em que cada imagem entra nos documentos (pdf, docx, html)
+DOCUMENT_IMAGE_DPI = int(os.getenv("DOCUMENT_IMAGE_DPI", 150))
+IMAGE_DERIVATIVE_FORMATS = [fmt for fmt in os.getenv("IMAGE_DERIVATIVE_FORMATS", "pdf").split(",") if fmt]  # geradas já no processamento
 
 # Configurações de sessão
-SESSION_TIMEOUT = 3600  # 1 hora em segundos 
\ No newline at end of file
+SESSION_TIMEOUT = 3600  # 1 hora em segundos
+
+# Configurações do processamento de updates
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", 4))  # threads para o trabalho bloqueante (transcrição/geração)
+MAX_CHATS_IN_FLIGHT = int(os.getenv("MAX_CHATS_IN_FLIGHT", 200))  # chats processados ao mesmo tempo (handlers assíncronos)
+INLINE_REPLY_TIMEOUT = float(os.getenv("INLINE_REPLY_TIMEOUT", 0.2))  # segundos; 0 desativa a resposta inline
+
+# Deduplicação de reentregas do webhook (update_id / MessageSid)
+DEDUP_MAX_ENTRIES = int(os.getenv("DEDUP_MAX_ENTRIES", 10000))
+DEDUP_TTL = int(os.getenv("DEDUP_TTL", 3600))  # segundos
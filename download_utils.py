@@ -0,0 +1,50 @@
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from config import MAX_DOWNLOAD_BYTES
+
+CHUNK_SIZE = 64 * 1024  # bytes lidos/escritos por vez
+
+class DownloadTooLarge(Exception):
+    """Arquivo maior que o limite configurado (MAX_DOWNLOAD_BYTES)"""
+
+def check_size(size: Optional[int], max_bytes: int = MAX_DOWNLOAD_BYTES):
+    """Rejeita o download se o tamanho informado passar do limite"""
+    if size is not None and int(size) > max_bytes:
+        raise DownloadTooLarge(f"Arquivo de {int(size)} bytes excede o limite de {max_bytes} bytes")
+
+@contextmanager
+def atomic_open(file_path, max_bytes: int = MAX_DOWNLOAD_BYTES):
+    """
+    Abre um arquivo temporário ao lado do destino para escrita em partes.
+
+    Ao sair sem erro, o temporário é renomeado para o destino (o arquivo nunca
+    aparece pela metade); em caso de erro ele é removido. A escrita também
+    falha se passar de `max_bytes`, para downloads sem Content-Length.
+    """
+    file_path = Path(file_path)
+    fd, tmp_path = tempfile.mkstemp(dir=file_path.parent, prefix=f".{file_path.name}.", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            yield _CappedWriter(f, max_bytes)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+class _CappedWriter:
+    def __init__(self, file, max_bytes: int):
+        self._file = file
+        self._max_bytes = max_bytes
+        self.written = 0
+
+    def write(self, chunk: bytes):
+        self.written += len(chunk)
+        check_size(self.written, self._max_bytes)
+        self._file.write(chunk)
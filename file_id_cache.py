@@ -0,0 +1,55 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from download_utils import CHUNK_SIZE
+
+def file_sha256(file_path) -> str:
+    """Hash do conteúdo do arquivo, lido em partes"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class FileIdCache:
+    """
+    Mapa hash do conteúdo -> file_id do Telegram para arquivos já enviados.
+
+    Reenviar os mesmos bytes (outro chat, ou de novo no mesmo chat) passa a
+    referenciar o file_id em vez de fazer o upload outra vez. Guarda no
+    máximo `max_entries` ids, descartando os usados há mais tempo.
+    """
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, content_hash: str) -> Optional[str]:
+        with self._lock:
+            file_id = self._entries.get(content_hash)
+            if file_id is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(content_hash)
+            self.hits += 1
+            return file_id
+
+    def put(self, content_hash: str, file_id: str):
+        with self._lock:
+            self._entries[content_hash] = file_id
+            self._entries.move_to_end(content_hash)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, content_hash: str):
+        """Esquece um file_id que o Telegram não aceitou mais"""
+        with self._lock:
+            self._entries.pop(content_hash, None)
+
+    def stats(self):
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,79 @@
+"""
+Cópias das imagens no tamanho exato em que entram em cada documento.
+
+O ImageProcessor grava as imagens com até 1200x800 pixels, mas no PDF elas
+ocupam uma caixa de 400x300 pontos: embutir o arquivo inteiro deixa o
+documento pesado e lento para abrir. Aqui cada imagem ganha, por formato,
+uma cópia com a proporção mantida dentro da caixa e a resolução do
+DOCUMENT_IMAGE_DPI, gravada ao lado do arquivo e reaproveitada enquanto o
+original não mudar.
+"""
+
+import io
+import logging
+import os
+from pathlib import Path
+from typing import Tuple
+
+from PIL import Image
+
+from config import DOCUMENT_IMAGE_DPI
+
+logger = logging.getLogger(__name__)
+
+QUALITY = 85  # mesma qualidade JPEG do ImageProcessor
+
+# Caixa máxima de cada formato, na unidade do próprio formato, e unidades por polegada
+FORMATS = {
+    "pdf": ((400, 300), 72),   # pontos (ReportLab)
+    "docx": ((432, 324), 72),  # pontos (6 x 4,5 polegadas)
+    "html": ((640, 480), 96)   # pixels CSS
+}
+
+def placed_size(image_size: Tuple[int, int], fmt: str) -> Tuple[float, float]:
+    """Tamanho no documento (unidade do formato) que cabe na caixa sem distorcer"""
+    (box_width, box_height), _ = FORMATS[fmt]
+    width, height = image_size
+    scale = min(box_width / width, box_height / height)
+    return width * scale, height * scale
+
+def derivative(path: str, fmt: str) -> Tuple[str, float, float]:
+    """
+    Cópia da imagem para o formato `fmt` ("pdf", "docx" ou "html").
+
+    Retorna (caminho, largura, altura), com o tamanho em que a imagem deve
+    ser colocada no documento, na unidade do formato. A cópia nunca tem mais
+    pixels que o original. No PDF é sempre JPEG, o único formato que o
+    ReportLab embute sem recodificar; nos outros, mantém o formato do
+    original (PNG com paleta para screenshots).
+    """
+    _, units_per_inch = FORMATS[fmt]
+    with Image.open(path) as img:
+        width, height = placed_size(img.size, fmt)
+        scale = min(DOCUMENT_IMAGE_DPI / units_per_inch * width / img.width, 1)
+        pixels = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+
+        source = Path(path)
+        extension = ".jpg" if fmt == "pdf" or source.suffix.lower() != ".png" else ".png"
+        cached = source.with_name(f"{source.stem}.{fmt}_{pixels[0]}x{pixels[1]}{extension}")
+        if cached.exists() and cached.stat().st_mtime >= source.stat().st_mtime:
+            return str(cached), width, height
+
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')  # transparência, CMYK, 16 bits (originais não processados)
+        if img.size != pixels:
+            img = img.resize(pixels, Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        if extension == ".png":
+            if img.mode == 'RGB':
+                img = img.quantize(256, dither=Image.Dither.NONE)
+            img.save(buffer, 'PNG', optimize=True)
+        else:
+            img.save(buffer, 'JPEG', quality=QUALITY, optimize=True)
+
+    # Grava num temporário e troca de uma vez: outro processo pode estar gerando a mesma cópia
+    temporary = cached.with_name(f"{cached.name}.{os.getpid()}.tmp")
+    temporary.write_bytes(buffer.getvalue())
+    os.replace(temporary, cached)
+    logger.debug(f"Cópia {fmt} de {path}: {pixels[0]}x{pixels[1]} ({len(buffer.getvalue()) // 1024} KB)")
+    return str(cached), width, height
@@ -0,0 +1,162 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+from config import IMAGE_WORKERS, IMAGE_DERIVATIVE_FORMATS
+from image_derivatives import derivative
+from image_processor import ImageProcessor
+
+logger = logging.getLogger(__name__)
+
+# Processador de cada processo worker (criado no primeiro uso)
+_processor: Optional[ImageProcessor] = None
+
+def _process(input_path: str, output_path: str) -> Tuple[Optional[str], float]:
+    """Processa uma imagem (roda no processo worker); retorna o caminho e o tempo gasto"""
+    global _processor
+    if _processor is None:
+        _processor = ImageProcessor()
+
+    start = time.perf_counter()
+    result = _processor.process_image(input_path, output_path)
+
+    if result and result != input_path:
+        try:
+            os.unlink(input_path)  # original não é mais necessário
+        except OSError:
+            pass
+
+    # Cópias no tamanho dos documentos, já prontas na hora de gerar (o resto sai sob demanda)
+    if result:
+        for fmt in IMAGE_DERIVATIVE_FORMATS:
+            try:
+                derivative(result, fmt)
+            except Exception as e:
+                logger.warning(f"Falha ao gerar cópia {fmt} de {result}: {e}")
+    return result, time.perf_counter() - start
+
+class ImagePipeline:
+    """
+    Pool de processos para o ImageProcessor.
+
+    Cada imagem recebida reserva sua posição em session['images'] e é
+    processada em segundo plano; rajadas de imagens (modo batch do WhatsApp,
+    álbuns do Telegram) usam todos os núcleos e a ordem de chegada é mantida.
+    `wait(session)` espera as pendentes antes de gerar o documento.
+    """
+
+    def __init__(self, num_workers: int = IMAGE_WORKERS):
+        self.num_workers = num_workers
+        self._executor = ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        self._lock = threading.Lock()
+
+        self.images = 0
+        self.failed = 0
+        self.image_seconds = 0.0
+        self.max_image_seconds = 0.0
+        self.batches = 0
+        self.batch_seconds = 0.0
+        self.formats: Dict[str, int] = {}  # imagens gravadas por extensão (.png, .jpg)
+        self.output_bytes = 0
+
+    def submit(self, session: Dict, input_path, output_path) -> Future:
+        """
+        Reserva a próxima posição em session['images'] e processa a imagem nela.
+
+        Se o processamento falhar, a posição fica com o arquivo original: cada
+        imagem continua no passo em que foi enviada.
+        """
+        images = session['images']
+        slot = len(images)
+        images.append(None)
+
+        pending = session.setdefault('pending_images', [])
+        if not pending:
+            session['images_started'] = time.perf_counter()
+
+        input_path = str(input_path)
+        future = self._executor.submit(_process, input_path, str(output_path))
+        future.add_done_callback(lambda done: self._finish(images, slot, input_path, done))
+        pending.append((images, slot, input_path, future))
+        return future
+
+    def wait(self, session: Dict) -> List[str]:
+        """
+        Espera as imagens pendentes da sessão.
+
+        Retorna session['images'] já com os caminhos processados, na ordem em
+        que chegaram (o original, para as que falharam).
+        """
+        pending = session.pop('pending_images', [])
+        if pending:
+            wait([future for _, _, _, future in pending])
+            for images, slot, input_path, future in pending:
+                images[slot] = self._result(future)[0] or input_path
+
+            elapsed = time.perf_counter() - session.pop('images_started')
+            with self._lock:
+                self.batches += 1
+                self.batch_seconds += elapsed
+            logger.info(f"Lote de {len(pending)} imagem(ns) processado em {elapsed:.2f}s")
+
+        session['images'][:] = [path for path in session['images'] if path]
+        return session['images']
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.num_workers,
+            "images": self.images,
+            "failed": self.failed,
+            "avg_image_seconds": round(self.image_seconds / self.images, 3) if self.images else 0.0,
+            "max_image_seconds": round(self.max_image_seconds, 3),
+            "formats": dict(self.formats),
+            "avg_output_kb": round(self.output_bytes / 1024 / sum(self.formats.values()), 1) if self.formats else 0.0,
+            "batches": self.batches,
+            "avg_batch_seconds": round(self.batch_seconds / self.batches, 3) if self.batches else 0.0
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _finish(self, images: List, slot: int, input_path: str, future: Future):
+        path, seconds = self._result(future)
+        images[slot] = path or input_path
+        size = os.path.getsize(path) if path and os.path.exists(path) else 0
+        with self._lock:
+            self.images += 1
+            self.image_seconds += seconds
+            self.max_image_seconds = max(self.max_image_seconds, seconds)
+            if path is None:
+                self.failed += 1
+                logger.warning(f"Imagem {slot + 1} não processada; usando o arquivo original")
+            else:
+                extension = os.path.splitext(path)[1]
+                self.formats[extension] = self.formats.get(extension, 0) + 1
+                self.output_bytes += size
+        logger.info(f"Imagem {slot + 1} processada em {seconds:.2f}s")
+
+    @staticmethod
+    def _result(future: Future) -> Tuple[Optional[str], float]:
+        try:
+            return future.result()
+        except Exception as e:
+            logger.error(f"Erro no processamento de imagem: {e}")
+            return None, 0.0
+
+_pipeline: Optional[ImagePipeline] = None
+_pipeline_lock = threading.Lock()
+
+def get_image_pipeline() -> ImagePipeline:
+    """Retorna o pool de processamento de imagens compartilhado do processo"""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = ImagePipeline()
+        return _pipeline
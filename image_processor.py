@@ -1,15 +1,94 @@
 from PIL import Image
+import io
 import os
 from pathlib import Path
 import logging
+import math
+
+import numpy as np
+
+from config import IMAGE_BYTE_BUDGET
 
 logger = logging.getLogger(__name__)
 
+# Classificador de screenshots (ver classify_screenshot)
+THUMBNAIL_SIZE = 128  # maior lado da miniatura analisada
+FLAT_DIFF = 4  # diferença de luminância entre vizinhos considerada "plana"
+STRONG_EDGE = 48  # diferença a partir da qual a borda é nítida (texto, bordas de UI)
+COMMON_RATIOS = [
+    1.77,  # 16:9
+    1.6,   # 16:10
+    1.33,  # 4:3
+    1.25,  # 5:4
+    2.17,  # 19.5:9 (celular em pé)
+    2.0    # 18:9
+]
+
+def screenshot_features(img):
+    """
+    Características de uma miniatura da imagem, calculadas numa única passada.
+
+    A miniatura usa vizinho mais próximo, que não mistura cores: as áreas
+    chapadas e as bordas nítidas de uma tela continuam como estão.
+    """
+    width, height = img.size
+    scale = min(THUMBNAIL_SIZE / max(width, height), 1)
+    thumb = img.resize((max(1, round(width * scale)), max(1, round(height * scale))), Image.Resampling.NEAREST)
+    thumb = thumb.convert('RGB')
+
+    # Histograma de cores quantizadas (4 bits por canal)
+    quantized = np.asarray(thumb) >> 4
+    codes = quantized[..., 0].astype(np.uint16) << 8 | quantized[..., 1] << 4 | quantized[..., 2]
+    histogram = np.bincount(codes.ravel(), minlength=4096)
+    used = histogram[histogram.nonzero()]
+    top_colors = np.sort(used)[-8:].sum() / codes.size
+
+    # Diferenças de luminância entre vizinhos (horizontal e vertical)
+    luma = np.asarray(thumb.convert('L'), dtype=np.int16)
+    diffs = [np.abs(np.diff(luma, axis=1)), np.abs(np.diff(luma, axis=0))]
+    total = sum(diff.size for diff in diffs)
+    flat = sum(np.count_nonzero(diff <= FLAT_DIFF) for diff in diffs)
+    strong = sum(np.count_nonzero(diff >= STRONG_EDGE) for diff in diffs)
+
+    ratio = max(width, height) / min(width, height)
+    return {
+        "colors": int(used.size),
+        "top_colors": float(top_colors),
+        "flat": flat / total if total else 1.0,
+        "sharp_edges": strong / max(1, total - flat),  # entre os vizinhos que não são planos
+        "common_ratio": any(abs(ratio - common) < 0.1 for common in COMMON_RATIOS)
+    }
+
+def classify_screenshot(img):
+    """
+    Decide se a imagem é um print de tela.
+
+    Retorna (é_screenshot, confiança), em que a confiança é a probabilidade
+    estimada (0 a 1) de ser screenshot. Telas têm poucas cores dominantes,
+    muitas áreas chapadas e bordas nítidas; fotos têm ruído e gradientes suaves.
+    """
+    features = screenshot_features(img)
+    score = (
+        -8.0
+        + 6.0 * features["top_colors"]
+        + 6.0 * features["flat"]
+        + 1.5 * features["sharp_edges"]
+        - 1.0 * min(features["colors"], 1024) / 1024
+        + 0.5 * features["common_ratio"]
+    )
+    confidence = 1 / (1 + math.exp(-score))
+    return confidence >= 0.5, confidence
+
+# Escolha de formato na gravação (ver ImageProcessor._encode)
+PNG_MAX_GROWTH = 1.25  # screenshot fica em PNG se não passar disso em relação ao JPEG
+MIN_QUALITY = 40  # menor qualidade JPEG aceita ao buscar o limite de bytes
+
 class ImageProcessor:
-    def __init__(self):
+    def __init__(self, byte_budget=IMAGE_BYTE_BUDGET):
         self.max_width = 1200  # Largura máxima para prints de tela
         self.max_height = 800  # Altura máxima para prints de tela
         self.quality = 85  # Qualidade da compressão JPEG
+        self.byte_budget = byte_budget  # Limite de bytes por imagem (0 = sem limite)
         self.supported_formats = ['.jpg', '.jpeg', '.png', '.heic', '.heif']
         self.active_sessions = {}
 
@@ -22,46 +101,57 @@ class ImageProcessor:
     
     def process_image(self, input_path, output_path=None):
         """
-        Processa a imagem para padronizar tamanho e qualidade
+        Processa a imagem para padronizar tamanho e qualidade.
+
+        Retorna o caminho gravado: a extensão de output_path é trocada pela do
+        formato escolhido (.png para screenshots, .jpg para fotos).
         """
         try:
             # Se output_path não for especificado, sobrescreve o arquivo original
-            if output_path is None:
+            overwrite = output_path is None
+            if overwrite:
                 output_path = input_path
             
-            # Abrir imagem
+            # Abrir imagem (só o cabeçalho; os pixels são decodificados depois)
             with Image.open(input_path) as img:
-                # Converter para RGB se necessário (para imagens PNG com transparência)
-                if img.mode in ('RGBA', 'P'):
-                    img = img.convert('RGB')
-                
                 # Detectar orientação da imagem (para fotos de celular)
-                try:
-                    exif = img._getexif()
-                    if exif:
-                        orientation = exif.get(274)  # 274 é o código EXIF para orientação
-                        if orientation:
-                            # Rotacionar imagem conforme orientação EXIF
-                            if orientation == 3:
-                                img = img.rotate(180, expand=True)
-                            elif orientation == 6:
-                                img = img.rotate(270, expand=True)
-                            elif orientation == 8:
-                                img = img.rotate(90, expand=True)
-                except:
-                    pass  # Ignora erros de EXIF
+                orientation = self._get_orientation(img)
                 
-                # Redimensionar mantendo proporção
-                width, height = img.size
+                # Limites na orientação em que a imagem está gravada (antes de girar)
+                if orientation in (6, 8):
+                    max_width, max_height = self.max_height, self.max_width
+                else:
+                    max_width, max_height = self.max_width, self.max_height
                 
                 # Calcular nova dimensão mantendo proporção
-                if width > self.max_width or height > self.max_height:
-                    ratio = min(self.max_width/width, self.max_height/height)
-                    new_size = (int(width * ratio), int(height * ratio))
+                width, height = img.size
+                ratio = min(max_width/width, max_height/height, 1)
+                new_size = (int(width * ratio), int(height * ratio))
+                
+                # JPEG: decodificar já reduzido (1/2, 1/4 ou 1/8 no domínio DCT),
+                # sem ficar menor que o tamanho final; outros formatos ignoram
+                img.draft(img.mode, new_size)
+                
+                # Converter para RGB se necessário (transparência, CMYK, 16 bits...)
+                if img.mode not in ('RGB', 'L'):
+                    img = img.convert('RGB')
+                
+                # Redimensionar mantendo proporção (ajuste fino em alta qualidade)
+                if img.size != new_size:
                     img = img.resize(new_size, Image.Resampling.LANCZOS)
                 
+                # Rotacionar imagem conforme orientação EXIF, já na imagem reduzida
+                if orientation == 3:
+                    img = img.transpose(Image.Transpose.ROTATE_180)
+                elif orientation == 6:
+                    img = img.transpose(Image.Transpose.ROTATE_270)
+                elif orientation == 8:
+                    img = img.transpose(Image.Transpose.ROTATE_90)
+                
                 # Ajustar contraste e brilho para prints de tela
-                if self._is_screenshot(img):
+                is_screenshot, confidence = classify_screenshot(img)
+                logger.debug(f"Screenshot: {is_screenshot} (confiança {confidence:.2f})")
+                if is_screenshot:
                     from PIL import ImageEnhance
                     # Aumentar contraste levemente para melhorar legibilidade
                     enhancer = ImageEnhance.Contrast(img)
@@ -70,43 +160,86 @@ class ImageProcessor:
                     enhancer = ImageEnhance.Sharpness(img)
                     img = enhancer.enhance(1.3)
                 
-                # Salvar imagem processada
-                img.save(
-                    output_path,
-                    'JPEG',
-                    quality=self.quality,
-                    optimize=True
-                )
-                
-                return output_path
+                # Codificar no formato adequado ao conteúdo
+                extension, data = self._encode(img, is_screenshot)
+            
+            # Salvar imagem processada
+            saved_path = str(Path(output_path).with_suffix(extension))
+            with open(saved_path, 'wb') as f:
+                f.write(data)
+            if overwrite and saved_path != str(input_path):
+                os.unlink(input_path)  # substituído pelo arquivo no novo formato
+            
+            return saved_path
                 
         except Exception as e:
             logger.error(f"Erro ao processar imagem {input_path}: {str(e)}")
             return None
     
+    def _encode(self, img, is_screenshot):
+        """
+        Escolhe o formato e codifica a imagem em memória; retorna (extensão, bytes).
+        
+        Screenshots vão para PNG com paleta (sem perdas até 256 cores), que
+        não cria halos em volta do texto e costuma ficar menor que o JPEG;
+        se a tela tiver muita foto/gradiente e o PNG crescer demais, fica o
+        JPEG. Com byte_budget, a qualidade do JPEG é a maior que cabe no limite.
+        """
+        jpeg = self._encode_jpeg(img, self.quality)
+        if is_screenshot:
+            try:
+                png = self._encode_png(img)
+            except Exception as e:
+                logger.warning(f"Falha ao gerar PNG, mantendo JPEG: {e}")
+                png = None
+            fits = png is not None and (not self.byte_budget or len(png) <= self.byte_budget)
+            if fits and len(png) <= len(jpeg) * PNG_MAX_GROWTH:
+                return '.png', png
+        if self.byte_budget and len(jpeg) > self.byte_budget:
+            jpeg = self._fit_budget(img)
+        return '.jpg', jpeg
+    
+    def _encode_jpeg(self, img, quality):
+        buffer = io.BytesIO()
+        img.save(buffer, 'JPEG', quality=quality, optimize=True)
+        return buffer.getvalue()
+    
+    def _encode_png(self, img):
+        if img.mode == 'RGB':
+            # Median cut mantém as cores exatas quando a imagem tem até 256
+            img = img.quantize(256, dither=Image.Dither.NONE)
+        buffer = io.BytesIO()
+        img.save(buffer, 'PNG', optimize=True)
+        return buffer.getvalue()
+    
+    def _fit_budget(self, img):
+        """Busca binária da maior qualidade JPEG que cabe em byte_budget"""
+        low, high = MIN_QUALITY, self.quality - 1
+        best = None
+        while low <= high:
+            quality = (low + high) // 2
+            data = self._encode_jpeg(img, quality)
+            if len(data) <= self.byte_budget:
+                best, low = data, quality + 1
+            else:
+                high = quality - 1
+        if best is None:
+            logger.warning(f"Imagem não cabe em {self.byte_budget} bytes; usando qualidade {MIN_QUALITY}")
+            best = self._encode_jpeg(img, MIN_QUALITY)
+        return best
+    
+    def _get_orientation(self, img):
+        """Orientação EXIF (274) lida do cabeçalho, sem decodificar a imagem"""
+        try:
+            return img.getexif().get(274)
+        except Exception:
+            return None  # Ignora erros de EXIF
+    
     def _is_screenshot(self, img):
         """
-        Tenta detectar se a imagem é um screenshot baseado em características comuns
+        Tenta detectar se a imagem é um screenshot (ver classify_screenshot)
         """
-        width, height = img.size
-        
-        # Screenshots geralmente têm dimensões específicas e proporções próximas a monitores
-        common_ratios = [
-            1.77,  # 16:9
-            1.6,   # 16:10
-            1.33,  # 4:3
-            1.25   # 5:4
-        ]
-        
-        img_ratio = width / height
-        # Verifica se a proporção está próxima de alguma proporção comum de tela
-        is_common_ratio = any(abs(img_ratio - ratio) < 0.1 for ratio in common_ratios)
-        
-        # Screenshots geralmente têm cores limitadas e áreas sólidas
-        colors = len(img.getcolors(maxcolors=1000)) if img.getcolors(maxcolors=1000) else 1000
-        has_limited_colors = colors < 1000
-        
-        return is_common_ratio and has_limited_colors
+        return classify_screenshot(img)[0]
     
     def is_supported_format(self, file_path):
         """Verifica se o formato do arquivo é suportado"""
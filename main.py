@@ -2,7 +2,6 @@ import os
 from dotenv import load_dotenv
 from fastapi import FastAPI, File, UploadFile, Request
 from pathlib import Path
-import whisper
 from datetime import datetime
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
@@ -14,6 +13,12 @@ import json
 import logging
 from whatsapp_handler import WhatsAppHandler
 from document_template import MIPDocTemplate
+from update_dispatcher import UpdateDispatcher
+from update_dedup import RecentIdIndex
+from transcription_service import get_transcription_service
+from file_id_cache import file_sha256
+from image_derivatives import derivative
+from config import WEBHOOK_WORKERS, DEDUP_MAX_ENTRIES, DEDUP_TTL, TRANSCRIPTION_PRELOAD
 
 # Carregar variáveis de ambiente
 load_dotenv()
@@ -25,12 +30,31 @@ logger = logging.getLogger(__name__)
 # Inicializar FastAPI
 app = FastAPI()
 
-# Inicializar modelo Whisper
-model = whisper.load_model("base")
+# Serviço de transcrição (processos dedicados com o modelo Whisper)
+transcription = get_transcription_service()
 
 # Inicializar WhatsApp handler
 whatsapp = WhatsAppHandler()
 
+# Processamento das mensagens em segundo plano
+dispatcher = UpdateDispatcher(WEBHOOK_WORKERS)
+
+# MessageSids recentes, para descartar reentregas do Twilio
+seen_messages = RecentIdIndex(DEDUP_MAX_ENTRIES, DEDUP_TTL)
+
+@app.on_event("startup")
+async def startup():
+    await dispatcher.start()
+    # O modelo carrega nos workers em segundo plano; a porta abre sem esperar
+    if TRANSCRIPTION_PRELOAD:
+        transcription.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await dispatcher.stop()
+    transcription.shutdown()
+    whatsapp.image_pipeline.shutdown()
+
 # Criar diretórios necessários
 Path("uploads").mkdir(exist_ok=True)
 Path("output").mkdir(exist_ok=True)
@@ -97,9 +121,10 @@ class DocumentGenerator:
             elements.append(Paragraph(f"{i}. {step}", styles["Normal"]))
             elements.append(Spacer(1, 12))
             
-            # Adicionar imagem se disponível
+            # Adicionar imagem se disponível (cópia no tamanho da página, sem distorcer)
             if i <= len(self.session.images):
-                img = Image(self.session.images[i-1], width=400, height=300)
+                image_path, width, height = derivative(self.session.images[i-1], "pdf")
+                img = Image(image_path, width=width, height=height)
                 elements.append(img)
                 elements.append(Spacer(1, 12))
 
@@ -109,8 +134,47 @@ class DocumentGenerator:
 async def whatsapp_webhook(request: Request):
     """Endpoint para receber mensagens do WhatsApp"""
     try:
-        form_data = await request.form()
+        form_data = dict(await request.form())
+        from_number = form_data.get("From", "").replace("whatsapp:", "")
+        
+        message_sid = form_data.get("MessageSid")
+        if message_sid and seen_messages.seen(message_sid):
+            return {"status": "duplicate"}
         
+        # Mensagens do mesmo número são processadas em ordem, em segundo plano
+        try:
+            dispatcher.submit(from_number, process_whatsapp_message, form_data)
+        except Exception:
+            if message_sid:
+                seen_messages.forget(message_sid)  # a reentrega do Twilio deve passar
+            raise
+        return {"status": "success"}
+    
+    except Exception as e:
+        logger.error(f"Erro no webhook: {str(e)}")
+        return {"status": "error", "message": str(e)}
+
+@app.get("/health")
+async def health():
+    """Liveness/readiness: o servidor responde mesmo antes do modelo carregar"""
+    return {
+        "status": "online",
+        "transcription_ready": transcription.ready
+    }
+
+@app.get("/stats")
+async def get_stats():
+    """Profundidade e tempo de espera das filas de processamento"""
+    return {
+        "dispatcher": dispatcher.stats(),
+        "duplicates_dropped": seen_messages.duplicates,
+        "transcription": transcription.stats(),
+        "images": whatsapp.image_pipeline.stats()
+    }
+
+def process_whatsapp_message(form_data: dict):
+    """Processa uma mensagem do WhatsApp (roda em um worker do dispatcher)"""
+    try:
         # Extrair informações da mensagem
         from_number = form_data.get("From", "").replace("whatsapp:", "")
         message_body = form_data.get("Body", "")
@@ -121,7 +185,7 @@ async def whatsapp_webhook(request: Request):
         # Processar mensagem de texto
         if message_body and not num_media:
             whatsapp.handle_message(from_number, "text", message_text=message_body)
-            return {"status": "success"}
+            return
         
         # Processar mídia
         if num_media > 0:
@@ -131,7 +195,7 @@ async def whatsapp_webhook(request: Request):
                     session = whatsapp.sessions.get(from_number)
                     if session and session['audio_path']:
                         # Transcrever áudio
-                        result = model.transcribe(session['audio_path'])
+                        result = transcription.submit(session['audio_path'], file_sha256(session['audio_path'])).result()
                         
                         # Criar ou atualizar sessão MIP
                         mip_session = MIPSession()
@@ -142,6 +206,9 @@ async def whatsapp_webhook(request: Request):
                         
                         # Se estiver no modo batch e já tiver imagens
                         if session.get('mode') == 'batch' and session['images']:
+                            # Esperar as imagens ainda em processamento (mantida a ordem de envio)
+                            mip_session.images = list(whatsapp.image_pipeline.wait(session))
+                            
                             # Gerar PDF
                             output_path = f"output/mip_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
                             doc_gen = DocumentGenerator(mip_session)
@@ -168,10 +235,12 @@ async def whatsapp_webhook(request: Request):
                         # Se estiver no modo sequencial e tiver uma sessão MIP
                         if session.get('mode') == 'sequential' and 'mip_session' in session:
                             mip_session = session['mip_session']
-                            mip_session.add_image(session['images'][-1])
                             
                             # Se número de imagens = número de passos, gerar PDF
-                            if len(mip_session.images) == len(mip_session.steps):
+                            if len(session['images']) == len(mip_session.steps):
+                                # Esperar as imagens ainda em processamento (mantida a ordem de envio)
+                                mip_session.images = list(whatsapp.image_pipeline.wait(session))
+                                
                                 # Gerar PDF
                                 output_path = f"output/mip_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
                                 doc_gen = DocumentGenerator(mip_session)
@@ -184,11 +253,8 @@ async def whatsapp_webhook(request: Request):
                                     "Documento MIP gerado com sucesso!"
                                 )
         
-        return {"status": "success"}
-    
     except Exception as e:
-        logger.error(f"Erro no webhook: {str(e)}")
-        return {"status": "error", "message": str(e)}
+        logger.error(f"Erro ao processar mensagem do WhatsApp: {str(e)}")
 
 @app.post("/process-audio")
 async def process_audio(file: UploadFile = File(...)):
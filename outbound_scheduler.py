@@ -0,0 +1,238 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from config import (
+    TELEGRAM_GLOBAL_RATE,
+    TELEGRAM_CHAT_RATE,
+    TELEGRAM_GROUP_RATE,
+    TELEGRAM_CHAT_BURST,
+    TELEGRAM_SEND_ATTEMPTS
+)
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Balde de tokens: `rate` tokens por segundo, acumulando até `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def delay(self) -> float:
+        """Segundos até haver um token disponível (0 se já houver)"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def pause(self, seconds: float):
+        """Esvazia o balde por `seconds` (usado com o retry_after do Telegram)"""
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+class _Outgoing:
+    def __init__(self, method: str, json: Optional[Dict], data: Optional[Dict],
+                 files: Optional[Dict], progress: bool, ordered: bool = True):
+        self.method = method
+        self.json = json
+        self.data = data
+        self.files = files  # nome do campo -> caminho do arquivo
+        self.progress = progress
+        self.ordered = ordered  # False: não espera terminar para liberar o próximo item
+        self.future = asyncio.get_running_loop().create_future()
+
+class OutboundScheduler:
+    """
+    Fila de envio para a Bot API respeitando os limites do Telegram.
+
+    Cada chat tem sua fila, consumida em ordem por uma task própria; um balde
+    de tokens por chat (1 msg/s, 20 msg/min em grupos) e um global (30 msg/s)
+    decidem quando cada mensagem sai. Respostas 429 não são descartadas: a
+    mensagem espera o `retry_after` e é reenviada. Mensagens de progresso
+    ainda na fila são agrupadas em uma só.
+    """
+
+    def __init__(
+        self,
+        api,
+        global_rate: float = TELEGRAM_GLOBAL_RATE,
+        chat_rate: float = TELEGRAM_CHAT_RATE,
+        group_rate: float = TELEGRAM_GROUP_RATE,
+        chat_burst: int = TELEGRAM_CHAT_BURST,
+        attempts: int = TELEGRAM_SEND_ATTEMPTS
+    ):
+        self.api = api
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.chat_burst = chat_burst
+        self.attempts = attempts
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self._buckets: Dict[int, TokenBucket] = {}
+        self._queues: Dict[int, Deque[_Outgoing]] = {}
+        self._tasks = set()  # referências às tasks de envio em andamento
+
+        self.sent = 0
+        self.merged = 0
+        self.rate_limited = 0
+
+    async def send_message(self, chat_id: int, text: str, parse_mode: str = "HTML") -> bool:
+        """Envia uma mensagem, aguardando a vez na fila do chat"""
+        data = {"chat_id": chat_id, "text": text, "parse_mode": parse_mode}
+        return await self.call(chat_id, "sendMessage", json=data) is not None
+
+    def notify(self, chat_id: int, text: str, parse_mode: str = "HTML") -> asyncio.Future:
+        """
+        Enfileira um aviso de progresso sem esperar o envio.
+
+        Se o último item da fila do chat também for um aviso ainda não enviado,
+        os dois viram uma única mensagem.
+        """
+        queue = self._queues.get(chat_id)
+        if queue and queue[-1].progress:
+            pending = queue[-1]
+            if text not in pending.json["text"].split("\n"):
+                pending.json["text"] += "\n" + text
+            self.merged += 1
+            return pending.future
+
+        data = {"chat_id": chat_id, "text": text, "parse_mode": parse_mode}
+        return self._enqueue(chat_id, _Outgoing("sendMessage", data, None, None, progress=True))
+
+    def edit_text(self, chat_id: int, message_id: int, text: str, parse_mode: str = "HTML") -> asyncio.Future:
+        """
+        Enfileira a edição de uma mensagem sem esperar o envio.
+
+        Se uma edição da mesma mensagem ainda estiver na fila, só o texto dela
+        é trocado: edições rápidas em sequência viram uma só chamada.
+        """
+        for pending in self._queues.get(chat_id, ()):
+            if pending.method == "editMessageText" and pending.json["message_id"] == message_id:
+                pending.json["text"] = text
+                self.merged += 1
+                return pending.future
+
+        data = {"chat_id": chat_id, "message_id": message_id, "text": text, "parse_mode": parse_mode}
+        return self._enqueue(chat_id, _Outgoing("editMessageText", data, None, None, progress=False))
+
+    async def call(self, chat_id: int, method: str, json: Optional[Dict] = None,
+                   data: Optional[Dict] = None, files: Optional[Dict] = None,
+                   ordered: bool = True) -> Optional[Dict]:
+        """
+        Enfileira uma chamada da Bot API para o chat e aguarda o resultado.
+
+        Com `ordered=False` a chamada ainda respeita os limites, mas o próximo
+        item do chat pode sair antes dela terminar (uploads em paralelo).
+        Retorna o campo `result` da resposta, ou None se a chamada falhou.
+        """
+        item = _Outgoing(method, json, data, files, progress=False, ordered=ordered)
+        future = self._enqueue(chat_id, item)
+        return await asyncio.shield(future)
+
+    def _enqueue(self, chat_id: int, item: "_Outgoing") -> asyncio.Future:
+        queue = self._queues.get(chat_id)
+        if queue is None:
+            queue = self._queues[chat_id] = deque()
+            queue.append(item)
+            task = asyncio.create_task(self._drain(chat_id, queue))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            queue.append(item)
+        return item.future
+
+    def stats(self) -> Dict:
+        return {
+            "sent": self.sent,
+            "merged": self.merged,
+            "rate_limited": self.rate_limited,
+            "queued": sum(len(queue) for queue in self._queues.values()),
+            "chats_waiting": len(self._queues)
+        }
+
+    def _bucket(self, chat_id: int) -> TokenBucket:
+        if chat_id not in self._buckets:
+            if len(self._buckets) >= 10000:
+                self._prune_buckets()
+            # chat_id negativo = grupo/canal, com limite por minuto mais baixo
+            rate = self.group_rate if chat_id < 0 else self.chat_rate
+            self._buckets[chat_id] = TokenBucket(rate, self.chat_burst)
+        return self._buckets[chat_id]
+
+    def _prune_buckets(self):
+        """Remove baldes já cheios de chats sem mensagens na fila"""
+        for chat_id, bucket in list(self._buckets.items()):
+            if chat_id not in self._queues and bucket.delay() == 0 and bucket.tokens >= bucket.capacity:
+                del self._buckets[chat_id]
+
+    async def _wait_for_token(self, chat_id: int):
+        bucket = self._bucket(chat_id)
+        while True:
+            delay = max(bucket.delay(), self.global_bucket.delay())
+            if delay <= 0:
+                bucket.take()
+                self.global_bucket.take()
+                return
+            await asyncio.sleep(delay)
+
+    async def _drain(self, chat_id: int, queue: Deque[_Outgoing]):
+        try:
+            while queue:
+                await self._wait_for_token(chat_id)
+                item = queue.popleft()
+                if item.ordered:
+                    await self._deliver(chat_id, item)
+                else:
+                    task = asyncio.create_task(self._deliver(chat_id, item))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+        finally:
+            del self._queues[chat_id]
+
+    async def _deliver(self, chat_id: int, item: _Outgoing):
+        result = await self._send(chat_id, item)
+        if not item.future.done():
+            item.future.set_result(result)
+
+    async def _send(self, chat_id: int, item: _Outgoing) -> Optional[Dict]:
+        for attempt in range(self.attempts):
+            try:
+                files = None
+                if item.files:
+                    files = {name: open(path, "rb") for name, path in item.files.items()}
+                try:
+                    response = await self.api.call(item.method, json=item.json, data=item.data, files=files)
+                finally:
+                    for file in (files or {}).values():
+                        file.close()
+            except Exception as e:
+                logger.error(f"Erro ao chamar {item.method} para o chat {chat_id}: {e}")
+                return None
+
+            if response.status_code != 429:
+                self.sent += 1
+                if response.status_code != 200:
+                    logger.error(f"{item.method} falhou para o chat {chat_id}: {response.text}")
+                    return None
+                return response.json().get("result", {})
+
+            # Limite atingido: esperar o tempo pedido pelo Telegram e reenviar
+            self.rate_limited += 1
+            retry_after = response.json().get("parameters", {}).get("retry_after", 1)
+            logger.warning(f"429 para o chat {chat_id}; aguardando {retry_after}s "
+                           f"(tentativa {attempt + 1}/{self.attempts})")
+            self._bucket(chat_id).pause(retry_after)
+            if attempt + 1 < self.attempts:
+                # O reenvio também consome token do chat e do global (o balde pausado
+                # já faz esperar o retry_after)
+                await self._wait_for_token(chat_id)
+
+        return None
@@ -1,16 +1,18 @@
-import requests
 import json
 from config import TELEGRAM_TOKEN
+from telegram_api import get_telegram_api
+
+# Cliente compartilhado da Bot API
+api = get_telegram_api(TELEGRAM_TOKEN)
 
 def setup_webhook(webhook_url):
     """Configura o webhook do Telegram"""
     print(f"🔗 Configurando webhook: {webhook_url}")
     
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/setWebhook"
     data = {"url": webhook_url}
     
     try:
-        response = requests.post(url, json=data)
+        response = api.call("setWebhook", json=data)
         result = response.json()
         
         if result.get("ok"):
@@ -29,10 +31,8 @@ def get_webhook_info():
     """Obtém informações do webhook atual"""
     print("📊 Verificando webhook atual...")
     
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/getWebhookInfo"
-    
     try:
-        response = requests.get(url)
+        response = api.call("getWebhookInfo")
         result = response.json()
         
         if result.get("ok"):
@@ -53,10 +53,8 @@ def delete_webhook():
     """Remove o webhook do Telegram"""
     print("🗑️ Removendo webhook...")
     
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/deleteWebhook"
-    
     try:
-        response = requests.post(url)
+        response = api.call("deleteWebhook")
         result = response.json()
         
         if result.get("ok"):
@@ -74,10 +72,8 @@ def test_bot():
     """Testa se o bot está funcionando"""
     print("🤖 Testando bot...")
     
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/getMe"
-    
     try:
-        response = requests.get(url)
+        response = api.call("getMe")
         result = response.json()
         
         if result.get("ok"):
@@ -0,0 +1,159 @@
+import asyncio
+import importlib.util
+import logging
+import threading
+from typing import Dict, Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import (
+    TELEGRAM_API_URL,
+    TELEGRAM_POOL_SIZE,
+    TELEGRAM_CONNECT_TIMEOUT,
+    TELEGRAM_READ_TIMEOUT,
+    TELEGRAM_UPLOAD_TIMEOUT,
+    TELEGRAM_MAX_CONCURRENCY,
+    MAX_DOWNLOAD_BYTES
+)
+from download_utils import CHUNK_SIZE, atomic_open, check_size
+
+logger = logging.getLogger(__name__)
+
+# O httpx registra cada URL em INFO, e as URLs da Bot API contêm o token
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+class TelegramAPI:
+    """
+    Cliente da Bot API do Telegram com pool de conexões keep-alive.
+
+    Todas as chamadas passam pela mesma `requests.Session`, que reaproveita as
+    conexões TCP/TLS com api.telegram.org em vez de abrir uma nova por mensagem.
+    """
+
+    def __init__(self, token: str, api_url: str = TELEGRAM_API_URL, pool_size: int = TELEGRAM_POOL_SIZE):
+        self.token = token
+        self.api_url = api_url.rstrip("/")
+        self.base_url = f"{self.api_url}/bot{token}"
+        self.timeout = (TELEGRAM_CONNECT_TIMEOUT, TELEGRAM_READ_TIMEOUT)
+        self.upload_timeout = (TELEGRAM_CONNECT_TIMEOUT, TELEGRAM_UPLOAD_TIMEOUT)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,  # um único host
+            pool_maxsize=pool_size,
+            pool_block=False,
+            # Só repete falhas de conexão; chamadas que chegaram ao servidor não são reenviadas
+            max_retries=Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.3)
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def call(self, method: str, json: Optional[Dict] = None, data: Optional[Dict] = None,
+             files: Optional[Dict] = None) -> requests.Response:
+        """Chama um método da Bot API (ex.: sendMessage, getFile)"""
+        timeout = self.upload_timeout if files else self.timeout
+        return self.session.post(
+            f"{self.base_url}/{method}",
+            json=json,
+            data=data,
+            files=files,
+            timeout=timeout
+        )
+
+    def close(self):
+        self.session.close()
+
+class AsyncTelegramAPI:
+    """
+    Cliente assíncrono da Bot API (httpx), usado pelos handlers do webhook.
+
+    Um semáforo global limita as requisições simultâneas, de modo que centenas
+    de chats podem ficar em andamento sem abrir centenas de conexões. Usa
+    HTTP/2 quando o pacote `h2` está instalado.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        api_url: str = TELEGRAM_API_URL,
+        pool_size: int = TELEGRAM_POOL_SIZE,
+        max_concurrency: int = TELEGRAM_MAX_CONCURRENCY
+    ):
+        self.token = token
+        self.api_url = api_url.rstrip("/")
+        self.base_url = f"{self.api_url}/bot{token}"
+        self.timeout = httpx.Timeout(TELEGRAM_READ_TIMEOUT, connect=TELEGRAM_CONNECT_TIMEOUT)
+        self.upload_timeout = httpx.Timeout(TELEGRAM_UPLOAD_TIMEOUT, connect=TELEGRAM_CONNECT_TIMEOUT)
+
+        transport = httpx.AsyncHTTPTransport(
+            http2=importlib.util.find_spec("h2") is not None,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            retries=2  # só falhas de conexão
+        )
+        self.client = httpx.AsyncClient(transport=transport, timeout=self.timeout)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def call(self, method: str, json: Optional[Dict] = None, data: Optional[Dict] = None,
+                   files: Optional[Dict] = None) -> httpx.Response:
+        """Chama um método da Bot API (ex.: sendMessage, getFile)"""
+        timeout = self.upload_timeout if files else self.timeout
+        async with self.semaphore:
+            return await self.client.post(
+                f"{self.base_url}/{method}",
+                json=json,
+                data=data,
+                files=files,
+                timeout=timeout
+            )
+
+    def file_url(self, file_path: str) -> str:
+        """URL de download de um arquivo retornado pelo getFile"""
+        return f"{self.api_url}/file/bot{self.token}/{file_path}"
+
+    async def get_file(self, file_id: str) -> Optional[Dict]:
+        """Obtém as informações (file_path, file_size) de um arquivo"""
+        response = await self.call("getFile", json={"file_id": file_id})
+        if response.status_code != 200:
+            return None
+        return response.json()["result"]
+
+    async def download_to(self, file_path: str, destination, max_bytes: int = MAX_DOWNLOAD_BYTES) -> bool:
+        """
+        Baixa um arquivo do Telegram direto para o disco, em partes.
+
+        O uso de memória não depende do tamanho do arquivo; downloads acima de
+        `max_bytes` são rejeitados pelo Content-Length antes de começar.
+        """
+        async with self.semaphore:
+            async with self.client.stream("GET", self.file_url(file_path), timeout=self.upload_timeout) as response:
+                if response.status_code != 200:
+                    return False
+                check_size(response.headers.get("Content-Length"), max_bytes)
+                with atomic_open(destination, max_bytes) as f:
+                    async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                        f.write(chunk)
+        return True
+
+    async def close(self):
+        await self.client.aclose()
+
+_clients: Dict[str, TelegramAPI] = {}
+_async_clients: Dict[str, AsyncTelegramAPI] = {}
+_clients_lock = threading.Lock()
+
+def get_telegram_api(token: str) -> TelegramAPI:
+    """Retorna o cliente compartilhado para o token (um pool por processo)"""
+    with _clients_lock:
+        if token not in _clients:
+            _clients[token] = TelegramAPI(token)
+        return _clients[token]
+
+def get_async_telegram_api(token: str) -> AsyncTelegramAPI:
+    """Retorna o cliente assíncrono compartilhado para o token"""
+    with _clients_lock:
+        if token not in _async_clients:
+            _async_clients[token] = AsyncTelegramAPI(token)
+        return _async_clients[token]
@@ -1,81 +1,145 @@
 import os
 import json
+import html
+import math
+import time
 import logging
-import requests
+import asyncio
+from telegram_api import get_async_telegram_api
+from outbound_scheduler import OutboundScheduler
+from file_id_cache import FileIdCache, file_sha256
+from download_utils import DownloadTooLarge, check_size
+from transcription_service import get_transcription_service, merge_results
+from image_pipeline import get_image_pipeline
+from config import MAX_DOWNLOAD_BYTES, FILE_ID_CACHE_SIZE, TRANSCRIPTION_WINDOW_SECONDS, TRANSCRIPTION_EDIT_INTERVAL
 from datetime import datetime
-from typing import Dict, List, Optional
-import whisper
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+CONFIRM_WORDS = ["sim", "s", "yes", "y"]  # respostas que confirmam a geração do MIP
+
 class TelegramHandler:
     def __init__(self, token: str):
         self.token = token
-        self.base_url = f"https://api.telegram.org/bot{token}"
+        self.api = get_async_telegram_api(token)  # cliente assíncrono compartilhado
+        self.outbox = OutboundScheduler(self.api)  # fila de envio com limites da Bot API
+        self.file_ids = FileIdCache(FILE_ID_CACHE_SIZE)  # hash do arquivo -> file_id já enviado
         self.sessions: Dict[int, Dict] = {}  # chat_id -> session_data
         
         # Criar diretórios necessários
         Path("uploads").mkdir(exist_ok=True)
         Path("output").mkdir(exist_ok=True)
         
-        # Carregar modelo Whisper
-        self.whisper_model = whisper.load_model("base")
+        # Transcrição e imagens rodam em pools de processos compartilhados
+        self.transcriber = get_transcription_service()
+        self.images = get_image_pipeline()
     
-    def send_message(self, chat_id: int, text: str, parse_mode: str = "HTML") -> bool:
-        """Envia mensagem de texto para o chat"""
+    async def send_message(self, chat_id: int, text: str, parse_mode: str = "HTML",
+                           progress: bool = False) -> bool:
+        """
+        Envia mensagem de texto para o chat (respeitando os limites da Bot API).
+
+        Avisos de progresso (`progress=True`) são apenas enfileirados e podem
+        ser agrupados com outros avisos do mesmo chat.
+        """
         try:
-            url = f"{self.base_url}/sendMessage"
-            data = {
-                "chat_id": chat_id,
-                "text": text,
-                "parse_mode": parse_mode
-            }
-            response = requests.post(url, json=data)
-            return response.status_code == 200
+            if progress:
+                self.outbox.notify(chat_id, text, parse_mode)
+                return True
+            return await self.outbox.send_message(chat_id, text, parse_mode)
         except Exception as e:
             logger.error(f"Erro ao enviar mensagem: {e}")
             return False
     
-    def send_document(self, chat_id: int, file_path: str, caption: str = "") -> bool:
-        """Envia documento para o chat"""
+    async def send_document(self, chat_id: int, file_path: str, caption: str = "",
+                            ordered: bool = True) -> bool:
+        """Envia documento para o chat (reaproveitando o file_id se já foi enviado)"""
         try:
-            url = f"{self.base_url}/sendDocument"
-            with open(file_path, 'rb') as file:
-                files = {'document': file}
+            content_hash = await asyncio.to_thread(file_sha256, file_path)
+            
+            file_id = self.file_ids.get(content_hash)
+            if file_id:
                 data = {
                     "chat_id": chat_id,
+                    "document": file_id,
                     "caption": caption
                 }
-                response = requests.post(url, data=data, files=files)
-            return response.status_code == 200
+                if await self.outbox.call(chat_id, "sendDocument", json=data, ordered=ordered) is not None:
+                    return True
+                self.file_ids.discard(content_hash)
+            
+            data = {
+                "chat_id": chat_id,
+                "caption": caption
+            }
+            result = await self.outbox.call(
+                chat_id, "sendDocument", data=data, files={'document': file_path}, ordered=ordered
+            )
+            if result is None:
+                return False
+            
+            if "document" in result:
+                self.file_ids.put(content_hash, result["document"]["file_id"])
+            return True
         except Exception as e:
             logger.error(f"Erro ao enviar documento: {e}")
             return False
     
-    def download_file(self, file_id: str, file_path: str) -> bool:
+    async def send_documents(self, chat_id: int, documents: List[Tuple[str, str]]) -> int:
+        """
+        Envia vários documentos (caminho, legenda) de uma vez.
+
+        Usa um único sendMediaGroup; se o grupo não for possível (um só arquivo
+        ou falha na chamada), envia os documentos em paralelo.
+        Retorna quantos documentos foram entregues.
+        """
+        if len(documents) >= 2:
+            hashes = await asyncio.gather(
+                *(asyncio.to_thread(file_sha256, path) for path, _ in documents)
+            )
+            
+            media, files = [], {}
+            for index, ((path, caption), content_hash) in enumerate(zip(documents, hashes)):
+                file_id = self.file_ids.get(content_hash)
+                if file_id is None:
+                    files[f"file{index}"] = path
+                    file_id = f"attach://file{index}"
+                media.append({"type": "document", "media": file_id, "caption": caption})
+            
+            data = {"chat_id": chat_id, "media": json.dumps(media)}
+            result = await self.outbox.call(chat_id, "sendMediaGroup", data=data, files=files or None)
+            if result is not None:
+                for message, content_hash in zip(result, hashes):
+                    if "document" in message:
+                        self.file_ids.put(content_hash, message["document"]["file_id"])
+                return len(result)
+            
+            logger.warning("sendMediaGroup falhou; enviando documentos separadamente")
+        
+        sent = await asyncio.gather(
+            *(self.send_document(chat_id, path, caption, ordered=False) for path, caption in documents)
+        )
+        return sum(sent)
+    
+    async def download_file(self, file_id: str, file_path: str) -> bool:
         """Baixa arquivo do Telegram"""
         try:
             # Obter informações do arquivo
-            url = f"{self.base_url}/getFile"
-            data = {"file_id": file_id}
-            response = requests.post(url, json=data)
-            
-            if response.status_code != 200:
+            file_info = await self.api.get_file(file_id)
+            if not file_info:
                 return False
             
-            file_info = response.json()["result"]
-            file_url = f"https://api.telegram.org/file/bot{self.token}/{file_info['file_path']}"
-            
-            # Baixar arquivo
-            file_response = requests.get(file_url)
-            if file_response.status_code == 200:
-                with open(file_path, 'wb') as f:
-                    f.write(file_response.content)
-                return True
+            # Rejeitar antes de baixar se o arquivo passar do limite
+            check_size(file_info.get("file_size"))
             
+            # Baixar arquivo direto para o disco
+            return await self.api.download_to(file_info["file_path"], file_path)
+        except DownloadTooLarge as e:
+            logger.warning(f"Download rejeitado: {e}")
             return False
         except Exception as e:
             logger.error(f"Erro ao baixar arquivo: {e}")
@@ -95,7 +159,14 @@ class TelegramHandler:
             }
         return self.sessions[chat_id]
     
-    def handle_message(self, update: Dict) -> str:
+    def is_slow_update(self, update: Dict) -> bool:
+        """True para textos que disparam trabalho longo (o "sim" que gera o MIP)"""
+        message = update.get("message", {})
+        session = self.sessions.get(message.get("chat", {}).get("id"))
+        text = message.get("text", "").strip().lower()
+        return bool(session) and session["state"] == "waiting_confirmation" and text in CONFIRM_WORDS
+    
+    async def handle_message(self, update: Dict) -> str:
         """Processa mensagem recebida do Telegram"""
         try:
             message = update.get("message", {})
@@ -109,17 +180,17 @@ class TelegramHandler:
             
             # Comandos de texto
             if text:
-                return self.handle_text_message(chat_id, text, session)
+                return await self.handle_text_message(chat_id, text, session)
             
             # Mídia (áudio, imagem, documento)
             if "audio" in message:
-                return self.handle_audio_message(chat_id, message["audio"], session)
+                return await self.handle_audio_message(chat_id, message["audio"], session)
             elif "voice" in message:
-                return self.handle_voice_message(chat_id, message["voice"], session)
+                return await self.handle_voice_message(chat_id, message["voice"], session)
             elif "photo" in message:
-                return self.handle_photo_message(chat_id, message["photo"], session)
+                return await self.handle_photo_message(chat_id, message["photo"], session)
             elif "document" in message:
-                return self.handle_document_message(chat_id, message["document"], session)
+                return await self.handle_document_message(chat_id, message["document"], session)
             
             return "Tipo de mensagem não suportado"
             
@@ -127,7 +198,7 @@ class TelegramHandler:
             logger.error(f"Erro ao processar mensagem: {e}")
             return f"Erro interno: {str(e)}"
     
-    def handle_text_message(self, chat_id: int, text: str, session: Dict) -> str:
+    async def handle_text_message(self, chat_id: int, text: str, session: Dict) -> str:
         """Processa mensagem de texto"""
         text = text.strip()
         
@@ -143,8 +214,8 @@ class TelegramHandler:
         
         # Se estiver aguardando confirmação
         if session["state"] == "waiting_confirmation":
-            if text.lower() in ["sim", "s", "yes", "y"]:
-                return self.generate_mip(chat_id, session)
+            if text.lower() in CONFIRM_WORDS:
+                return await self.generate_mip(chat_id, session)
             elif text.lower() in ["não", "nao", "n", "no"]:
                 session["state"] = "initial"
                 return "❌ MIP cancelado. Use /new para começar novamente."
@@ -204,22 +275,35 @@ class TelegramHandler:
         else:
             return "❓ Comando não reconhecido. Use /help para ver os comandos disponíveis."
     
-    def handle_audio_message(self, chat_id: int, audio: Dict, session: Dict) -> str:
+    async def handle_audio_message(self, chat_id: int, audio: Dict, session: Dict) -> str:
         """Processa mensagem de áudio"""
         if session["state"] not in ["waiting_audio", "waiting_images"]:
             return "❌ Envie um áudio apenas quando solicitado. Use /new para começar."
         
+        if audio.get("file_size", 0) > MAX_DOWNLOAD_BYTES:
+            return f"❌ Áudio muito grande. O limite é de {MAX_DOWNLOAD_BYTES // (1024 * 1024)} MB."
+        
         try:
-            # Baixar áudio
-            file_id = audio["file_id"]
-            file_path = f"uploads/audio_{chat_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.ogg"
-            
-            if not self.download_file(file_id, file_path):
-                return "❌ Erro ao baixar áudio. Tente novamente."
+            # Áudio já transcrito (reenviado/encaminhado): nem precisa baixar
+            cache_key = f"telegram:{audio['file_unique_id']}" if audio.get("file_unique_id") else None
+            result = self.transcriber.lookup(cache_key) if cache_key else None
+            file_path = None
             
-            # Transcrever áudio
-            self.send_message(chat_id, "🎵 Processando áudio...")
-            result = self.whisper_model.transcribe(file_path)
+            if result is None:
+                # Baixar áudio
+                file_id = audio["file_id"]
+                file_path = f"uploads/audio_{chat_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.ogg"
+                
+                if not await self.download_file(file_id, file_path):
+                    return "❌ Erro ao baixar áudio. Tente novamente."
+                
+                # Transcrever áudio (roda nos processos do serviço de transcrição)
+                duration = audio.get("duration", 0)
+                if duration > TRANSCRIPTION_WINDOW_SECONDS:
+                    result = await self.transcribe_progressive(chat_id, file_path, duration, cache_key, session)
+                else:
+                    await self.send_message(chat_id, "🎵 Processando áudio...", progress=True)
+                    result = await self.transcribe_with_draft(file_path, cache_key, duration, session)
             transcription = result["text"].strip()
             
             if not transcription:
@@ -243,11 +327,90 @@ class TelegramHandler:
             logger.error(f"Erro ao processar áudio: {e}")
             return "❌ Erro ao processar áudio. Tente novamente."
     
-    def handle_voice_message(self, chat_id: int, voice: Dict, session: Dict) -> str:
+    async def transcribe_with_draft(self, file_path: str, cache_key: Optional[str],
+                                    duration: Optional[float], session: Dict) -> Dict:
+        """
+        Transcreve primeiro com o modelo de rascunho e responde com ele.
+
+        O modelo principal continua em segundo plano; quando termina, troca a
+        transcrição e os passos da sessão se o texto mudou. A geração do MIP
+        espera essa troca (session["refinement"]).
+        """
+        draft_model = self.transcriber.draft_model
+        if not draft_model:
+            return await self.transcriber.transcribe(file_path, cache_key, duration)
+        
+        # O rascunho entra na fila antes, então sai antes do modelo principal
+        draft = asyncio.wrap_future(self.transcriber.submit(file_path, duration=duration, model=draft_model))
+        final = asyncio.wrap_future(self.transcriber.submit(file_path, cache_key, duration))
+        
+        try:
+            result = await draft
+        except Exception as e:
+            # Sem rascunho: espera o modelo principal (que já está na fila)
+            logger.warning(f"Falha no rascunho, aguardando o modelo principal: {e}")
+            return await final
+        draft_text = result["text"].strip()
+        if not draft_text or (final.done() and not final.exception()):
+            return await final
+        
+        session["refinement"] = asyncio.create_task(self.apply_refinement(session, final, draft_text))
+        return result
+    
+    async def apply_refinement(self, session: Dict, final: asyncio.Future, draft_text: str):
+        """Substitui o rascunho da sessão pela transcrição do modelo principal"""
+        try:
+            result = await final
+        except Exception as e:
+            logger.error(f"Erro na transcrição final (mantido o rascunho): {e}")
+            return
+        
+        text = result["text"].strip()
+        # A sessão pode ter sido reiniciada (/new) enquanto o modelo rodava
+        if text and text != draft_text and session.get("transcription") == draft_text:
+            session["transcription"] = text
+            session["steps"] = [line.strip() for line in text.split('\n') if line.strip()]
+            logger.info("Transcrição do rascunho substituída pela do modelo principal")
+    
+    async def transcribe_progressive(self, chat_id: int, file_path: str, duration: float,
+                                     cache_key: Optional[str], session: Dict) -> Dict:
+        """
+        Transcreve um áudio longo por janelas.
+
+        Uma mensagem de status é editada com a transcrição parcial (no máximo
+        uma edição a cada TRANSCRIPTION_EDIT_INTERVAL segundos) e os passos da
+        sessão são preenchidos conforme cada janela termina.
+        """
+        windows = math.ceil(duration / TRANSCRIPTION_WINDOW_SECONDS)
+        status = await self.outbox.call(
+            chat_id, "sendMessage", json={"chat_id": chat_id, "text": f"🎵 Processando áudio (0/{windows})..."}
+        )
+        message_id = status.get("message_id") if status else None
+        
+        results = []
+        last_edit = 0.0
+        async for window in self.transcriber.transcribe_windows(file_path, duration, cache_key):
+            results.append(window)
+            partial = merge_results(results)["text"]
+            session["transcription"] = partial
+            session["steps"] = [line.strip() for line in partial.split('\n') if line.strip()]
+            
+            # A última janela não precisa de edição: a resposta final traz o texto completo
+            now = time.monotonic()
+            if message_id and len(results) < windows and now - last_edit >= TRANSCRIPTION_EDIT_INTERVAL:
+                last_edit = now
+                self.outbox.edit_text(
+                    chat_id, message_id,
+                    f"🎵 Processando áudio ({len(results)}/{windows})...\n\n{html.escape(partial[-3500:])}"
+                )
+        
+        return merge_results(results)
+    
+    async def handle_voice_message(self, chat_id: int, voice: Dict, session: Dict) -> str:
         """Processa mensagem de voz (trata como áudio)"""
-        return self.handle_audio_message(chat_id, voice, session)
+        return await self.handle_audio_message(chat_id, voice, session)
     
-    def handle_photo_message(self, chat_id: int, photos: List[Dict], session: Dict) -> str:
+    async def handle_photo_message(self, chat_id: int, photos: List[Dict], session: Dict) -> str:
         """Processa mensagem de foto"""
         if session["state"] != "waiting_images":
             return "❌ Envie fotos apenas quando solicitado. Use /new para começar."
@@ -255,13 +418,18 @@ class TelegramHandler:
         try:
             # Pegar a foto de maior resolução (última da lista)
             photo = photos[-1]
+            if photo.get("file_size", 0) > MAX_DOWNLOAD_BYTES:
+                return f"❌ Foto muito grande. O limite é de {MAX_DOWNLOAD_BYTES // (1024 * 1024)} MB."
             file_id = photo["file_id"]
-            file_path = f"uploads/image_{chat_id}_{len(session['images'])}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
+            name = f"{chat_id}_{len(session['images'])}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
+            file_path = f"uploads/image_{name}"
             
-            if not self.download_file(file_id, file_path):
+            if not await self.download_file(file_id, file_path):
                 return "❌ Erro ao baixar imagem. Tente novamente."
             
-            session["images"].append(file_path)
+            # Processamento em segundo plano (fotos de um álbum usam vários núcleos);
+            # a posição da foto em session["images"] já fica reservada
+            self.images.submit(session, file_path, f"uploads/processed_image_{name}")
             
             remaining = len(session["steps"]) - len(session["images"])
             
@@ -280,7 +448,7 @@ class TelegramHandler:
             logger.error(f"Erro ao processar foto: {e}")
             return "❌ Erro ao processar foto. Tente novamente."
     
-    def handle_document_message(self, chat_id: int, document: Dict, session: Dict) -> str:
+    async def handle_document_message(self, chat_id: int, document: Dict, session: Dict) -> str:
         """Processa mensagem de documento"""
         return "❌ Documentos não são suportados. Envie apenas fotos dos passos."
     
@@ -300,10 +468,18 @@ class TelegramHandler:
         
         return status_text
     
-    def generate_mip(self, chat_id: int, session: Dict) -> str:
+    async def generate_mip(self, chat_id: int, session: Dict) -> str:
         """Gera o MIP final"""
         try:
-            self.send_message(chat_id, "🔄 Gerando MIP...")
+            await self.send_message(chat_id, "🔄 Gerando MIP...", progress=True)
+            
+            # Usar a transcrição do modelo principal, se ainda estiver rodando
+            refinement = session.pop("refinement", None)
+            if refinement is not None:
+                await refinement
+            
+            # Esperar as fotos ainda em processamento
+            await asyncio.to_thread(self.images.wait, session)
             
             # Gerar arquivos
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -320,20 +496,17 @@ class TelegramHandler:
             html_path = f"output/mip_{timestamp}.html"
             # TODO: Implementar geração com dados reais
             
-            # Enviar arquivos
-            success_count = 0
-            
-            if os.path.exists(pdf_path):
-                if self.send_document(chat_id, pdf_path, "📄 MIP em PDF"):
-                    success_count += 1
-            
-            if os.path.exists(docx_path):
-                if self.send_document(chat_id, docx_path, "📝 MIP editável (DOCX)"):
-                    success_count += 1
-            
-            if os.path.exists(html_path):
-                if self.send_document(chat_id, html_path, "🌐 MIP para Google Docs (HTML)"):
-                    success_count += 1
+            # Enviar arquivos (todos de uma vez)
+            documents = [
+                (path, caption)
+                for path, caption in [
+                    (pdf_path, "📄 MIP em PDF"),
+                    (docx_path, "📝 MIP editável (DOCX)"),
+                    (html_path, "🌐 MIP para Google Docs (HTML)")
+                ]
+                if os.path.exists(path)
+            ]
+            success_count = await self.send_documents(chat_id, documents) if documents else 0
             
             # Resetar sessão
             session["state"] = "initial"
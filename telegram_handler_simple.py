@@ -1,7 +1,12 @@
 import os
 import json
 import logging
-import requests
+import asyncio
+from telegram_api import get_async_telegram_api
+from outbound_scheduler import OutboundScheduler
+from file_id_cache import FileIdCache, file_sha256
+from download_utils import DownloadTooLarge, check_size
+from config import MAX_DOWNLOAD_BYTES, FILE_ID_CACHE_SIZE
 from datetime import datetime
 from typing import Dict, List, Optional
 from pathlib import Path
@@ -13,65 +18,78 @@ logger = logging.getLogger(__name__)
 class TelegramHandlerSimple:
     def __init__(self, token: str):
         self.token = token
-        self.base_url = f"https://api.telegram.org/bot{token}"
+        self.api = get_async_telegram_api(token)  # cliente assíncrono compartilhado
+        self.outbox = OutboundScheduler(self.api)  # fila de envio com limites da Bot API
+        self.file_ids = FileIdCache(FILE_ID_CACHE_SIZE)  # hash do arquivo -> file_id já enviado
         self.sessions: Dict[int, Dict] = {}  # chat_id -> session_data
         
         # Criar diretórios necessários
         Path("uploads").mkdir(exist_ok=True)
         Path("output").mkdir(exist_ok=True)
     
-    def send_message(self, chat_id: int, text: str, parse_mode: str = "HTML") -> bool:
-        """Envia mensagem de texto para o chat"""
+    async def send_message(self, chat_id: int, text: str, parse_mode: str = "HTML",
+                           progress: bool = False) -> bool:
+        """
+        Envia mensagem de texto para o chat (respeitando os limites da Bot API).
+
+        Avisos de progresso (`progress=True`) são apenas enfileirados e podem
+        ser agrupados com outros avisos do mesmo chat.
+        """
         try:
-            url = f"{self.base_url}/sendMessage"
-            data = {
-                "chat_id": chat_id,
-                "text": text,
-                "parse_mode": parse_mode
-            }
-            response = requests.post(url, json=data)
-            return response.status_code == 200
+            if progress:
+                self.outbox.notify(chat_id, text, parse_mode)
+                return True
+            return await self.outbox.send_message(chat_id, text, parse_mode)
         except Exception as e:
             logger.error(f"Erro ao enviar mensagem: {e}")
             return False
     
-    def send_document(self, chat_id: int, file_path: str, caption: str = "") -> bool:
-        """Envia documento para o chat"""
+    async def send_document(self, chat_id: int, file_path: str, caption: str = "") -> bool:
+        """Envia documento para o chat (reaproveitando o file_id se já foi enviado)"""
         try:
-            url = f"{self.base_url}/sendDocument"
-            with open(file_path, 'rb') as file:
-                files = {'document': file}
+            content_hash = await asyncio.to_thread(file_sha256, file_path)
+            
+            file_id = self.file_ids.get(content_hash)
+            if file_id:
                 data = {
                     "chat_id": chat_id,
+                    "document": file_id,
                     "caption": caption
                 }
-                response = requests.post(url, data=data, files=files)
-            return response.status_code == 200
+                if await self.outbox.call(chat_id, "sendDocument", json=data) is not None:
+                    return True
+                self.file_ids.discard(content_hash)
+            
+            data = {
+                "chat_id": chat_id,
+                "caption": caption
+            }
+            result = await self.outbox.call(chat_id, "sendDocument", data=data, files={'document': file_path})
+            if result is None:
+                return False
+            
+            if "document" in result:
+                self.file_ids.put(content_hash, result["document"]["file_id"])
+            return True
         except Exception as e:
             logger.error(f"Erro ao enviar documento: {e}")
             return False
     
-    def download_file(self, file_id: str, file_path: str) -> bool:
+    async def download_file(self, file_id: str, file_path: str) -> bool:
         """Baixa arquivo do Telegram"""
         try:
             # Obter informações do arquivo
-            url = f"{self.base_url}/getFile"
-            data = {"file_id": file_id}
-            response = requests.post(url, json=data)
-            
-            if response.status_code != 200:
+            file_info = await self.api.get_file(file_id)
+            if not file_info:
                 return False
             
-            file_info = response.json()["result"]
-            file_url = f"https://api.telegram.org/file/bot{self.token}/{file_info['file_path']}"
-            
-            # Baixar arquivo
-            file_response = requests.get(file_url)
-            if file_response.status_code == 200:
-                with open(file_path, 'wb') as f:
-                    f.write(file_response.content)
-                return True
+            # Rejeitar antes de baixar se o arquivo passar do limite
+            check_size(file_info.get("file_size"))
             
+            # Baixar arquivo direto para o disco
+            return await self.api.download_to(file_info["file_path"], file_path)
+        except DownloadTooLarge as e:
+            logger.warning(f"Download rejeitado: {e}")
             return False
         except Exception as e:
             logger.error(f"Erro ao baixar arquivo: {e}")
@@ -91,7 +109,7 @@ class TelegramHandlerSimple:
             }
         return self.sessions[chat_id]
     
-    def handle_message(self, update: Dict) -> str:
+    async def handle_message(self, update: Dict) -> str:
         """Processa mensagem recebida do Telegram"""
         try:
             message = update.get("message", {})
@@ -105,17 +123,17 @@ class TelegramHandlerSimple:
             
             # Comandos de texto
             if text:
-                return self.handle_text_message(chat_id, text, session)
+                return await self.handle_text_message(chat_id, text, session)
             
             # Mídia (áudio, imagem, documento)
             if "audio" in message:
-                return self.handle_audio_message(chat_id, message["audio"], session)
+                return await self.handle_audio_message(chat_id, message["audio"], session)
             elif "voice" in message:
-                return self.handle_voice_message(chat_id, message["voice"], session)
+                return await self.handle_voice_message(chat_id, message["voice"], session)
             elif "photo" in message:
-                return self.handle_photo_message(chat_id, message["photo"], session)
+                return await self.handle_photo_message(chat_id, message["photo"], session)
             elif "document" in message:
-                return self.handle_document_message(chat_id, message["document"], session)
+                return await self.handle_document_message(chat_id, message["document"], session)
             
             return "Tipo de mensagem não suportado"
             
@@ -123,7 +141,7 @@ class TelegramHandlerSimple:
             logger.error(f"Erro ao processar mensagem: {e}")
             return f"Erro interno: {str(e)}"
     
-    def handle_text_message(self, chat_id: int, text: str, session: Dict) -> str:
+    async def handle_text_message(self, chat_id: int, text: str, session: Dict) -> str:
         """Processa mensagem de texto"""
         text = text.strip()
         
@@ -140,7 +158,7 @@ class TelegramHandlerSimple:
         # Se estiver aguardando confirmação
         if session["state"] == "waiting_confirmation":
             if text.lower() in ["sim", "s", "yes", "y"]:
-                return self.generate_mip(chat_id, session)
+                return await self.generate_mip(chat_id, session)
             elif text.lower() in ["não", "nao", "n", "no"]:
                 session["state"] = "initial"
                 return "❌ MIP cancelado. Use /new para começar novamente."
@@ -200,17 +218,20 @@ class TelegramHandlerSimple:
         else:
             return "❓ Comando não reconhecido. Use /help para ver os comandos disponíveis."
     
-    def handle_audio_message(self, chat_id: int, audio: Dict, session: Dict) -> str:
+    async def handle_audio_message(self, chat_id: int, audio: Dict, session: Dict) -> str:
         """Processa mensagem de áudio (versão simplificada)"""
         if session["state"] not in ["waiting_audio", "waiting_images"]:
             return "❌ Envie um áudio apenas quando solicitado. Use /new para começar."
         
+        if audio.get("file_size", 0) > MAX_DOWNLOAD_BYTES:
+            return f"❌ Áudio muito grande. O limite é de {MAX_DOWNLOAD_BYTES // (1024 * 1024)} MB."
+        
         try:
             # Baixar áudio
             file_id = audio["file_id"]
             file_path = f"uploads/audio_{chat_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.ogg"
             
-            if not self.download_file(file_id, file_path):
+            if not await self.download_file(file_id, file_path):
                 return "❌ Erro ao baixar áudio. Tente novamente."
             
             # Versão simplificada - sem transcrição
@@ -229,11 +250,11 @@ class TelegramHandlerSimple:
             logger.error(f"Erro ao processar áudio: {e}")
             return "❌ Erro ao processar áudio. Tente novamente."
     
-    def handle_voice_message(self, chat_id: int, voice: Dict, session: Dict) -> str:
+    async def handle_voice_message(self, chat_id: int, voice: Dict, session: Dict) -> str:
         """Processa mensagem de voz (trata como áudio)"""
-        return self.handle_audio_message(chat_id, voice, session)
+        return await self.handle_audio_message(chat_id, voice, session)
     
-    def handle_photo_message(self, chat_id: int, photos: List[Dict], session: Dict) -> str:
+    async def handle_photo_message(self, chat_id: int, photos: List[Dict], session: Dict) -> str:
         """Processa mensagem de foto"""
         if session["state"] != "waiting_images":
             return "❌ Envie fotos apenas quando solicitado. Use /new para começar."
@@ -241,10 +262,12 @@ class TelegramHandlerSimple:
         try:
             # Pegar a foto de maior resolução (última da lista)
             photo = photos[-1]
+            if photo.get("file_size", 0) > MAX_DOWNLOAD_BYTES:
+                return f"❌ Foto muito grande. O limite é de {MAX_DOWNLOAD_BYTES // (1024 * 1024)} MB."
             file_id = photo["file_id"]
             file_path = f"uploads/image_{chat_id}_{len(session['images'])}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
             
-            if not self.download_file(file_id, file_path):
+            if not await self.download_file(file_id, file_path):
                 return "❌ Erro ao baixar imagem. Tente novamente."
             
             session["images"].append(file_path)
@@ -266,7 +289,7 @@ class TelegramHandlerSimple:
             logger.error(f"Erro ao processar foto: {e}")
             return "❌ Erro ao processar foto. Tente novamente."
     
-    def handle_document_message(self, chat_id: int, document: Dict, session: Dict) -> str:
+    async def handle_document_message(self, chat_id: int, document: Dict, session: Dict) -> str:
         """Processa mensagem de documento"""
         return "❌ Documentos não são suportados. Envie apenas fotos dos passos."
     
@@ -286,10 +309,10 @@ class TelegramHandlerSimple:
         
         return status_text
     
-    def generate_mip(self, chat_id: int, session: Dict) -> str:
+    async def generate_mip(self, chat_id: int, session: Dict) -> str:
         """Gera o MIP final (versão simplificada)"""
         try:
-            self.send_message(chat_id, "🔄 Gerando MIP...")
+            await self.send_message(chat_id, "🔄 Gerando MIP...", progress=True)
             
             # Gerar arquivos de exemplo
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -320,7 +343,7 @@ class TelegramHandlerSimple:
                 f.write(html_content)
             
             # Enviar arquivo
-            success = self.send_document(chat_id, html_path, "📄 MIP gerado com sucesso!")
+            success = await self.send_document(chat_id, html_path, "📄 MIP gerado com sucesso!")
             
             # Resetar sessão
             session["state"] = "initial"
@@ -3,6 +3,13 @@ from fastapi.responses import JSONResponse
 import uvicorn
 import logging
 from telegram_handler import TelegramHandler
+from telegram_webhook import TelegramWebhook
+from update_dispatcher import UpdateDispatcher
+from update_dedup import RecentIdIndex
+from config import (
+    WEBHOOK_WORKERS, MAX_CHATS_IN_FLIGHT, DEDUP_MAX_ENTRIES, DEDUP_TTL, INLINE_REPLY_TIMEOUT,
+    TRANSCRIPTION_PRELOAD
+)
 import os
 from dotenv import load_dotenv
 
@@ -23,6 +30,29 @@ if not TELEGRAM_TOKEN:
 
 telegram_handler = TelegramHandler(TELEGRAM_TOKEN)
 
+# Processamento dos updates em segundo plano
+dispatcher = UpdateDispatcher(MAX_CHATS_IN_FLIGHT, WEBHOOK_WORKERS)
+webhook = TelegramWebhook(
+    telegram_handler,
+    dispatcher,
+    RecentIdIndex(DEDUP_MAX_ENTRIES, DEDUP_TTL),
+    INLINE_REPLY_TIMEOUT
+)
+
+@app.on_event("startup")
+async def startup():
+    await dispatcher.start()
+    # O modelo carrega nos workers em segundo plano; a porta abre sem esperar
+    if TRANSCRIPTION_PRELOAD:
+        telegram_handler.transcriber.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await dispatcher.stop()
+    telegram_handler.transcriber.shutdown()
+    telegram_handler.images.shutdown()
+    await telegram_handler.api.close()
+
 @app.get("/")
 async def root():
     """Endpoint raiz para verificar se o servidor está funcionando"""
@@ -32,43 +62,57 @@ async def root():
         "bot_username": "@RFTec_bot"
     }
 
+@app.get("/health")
+async def health():
+    """Liveness/readiness: o servidor responde mesmo antes do modelo carregar"""
+    return {
+        "status": "online",
+        "transcription_ready": telegram_handler.transcriber.ready
+    }
+
 @app.post("/webhook/telegram")
 async def telegram_webhook(request: Request):
     """Endpoint para receber webhooks do Telegram"""
     try:
-        # Obter dados da requisição
         update = await request.json()
-        logger.info(f"Webhook recebido: {update}")
-        
-        # Processar mensagem
-        response_text = telegram_handler.handle_message(update)
-        
-        # Enviar resposta
-        if response_text:
-            message = update.get("message", {})
-            chat_id = message.get("chat", {}).get("id")
-            if chat_id:
-                telegram_handler.send_message(chat_id, response_text)
-        
-        return JSONResponse(content={"status": "success"})
+    except Exception:
+        raise HTTPException(status_code=400, detail="JSON inválido")
     
-    except Exception as e:
-        logger.error(f"Erro no webhook: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    logger.info(f"Webhook recebido: {update}")
+    
+    if not webhook.is_valid(update):
+        return JSONResponse(content={"status": "ignored"})
+    
+    # Reentregas do Telegram (servidor lento) não chegam ao handler
+    if webhook.is_duplicate(update):
+        return JSONResponse(content={"status": "duplicate"})
+    
+    # Processamento acontece nos workers; respostas rápidas voltam inline
+    return JSONResponse(content=await webhook.dispatch(update))
+
+@app.get("/stats")
+async def get_stats():
+    """Profundidade e tempo de espera das filas de processamento"""
+    return {
+        "dispatcher": dispatcher.stats(),
+        "duplicates_dropped": webhook.dedup.duplicates,
+        "inline_replies": webhook.inline_replies,
+        "outbound": telegram_handler.outbox.stats(),
+        "file_id_cache": telegram_handler.file_ids.stats(),
+        "transcription": telegram_handler.transcriber.stats(),
+        "images": telegram_handler.images.stats()
+    }
 
 @app.get("/set-webhook")
 async def set_webhook():
     """Configura o webhook do Telegram (para desenvolvimento)"""
     try:
-        import requests
-        
         # URL do webhook (substitua pela sua URL pública)
         webhook_url = "https://seu-dominio.com/webhook/telegram"
         
-        url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/setWebhook"
         data = {"url": webhook_url}
         
-        response = requests.post(url, json=data)
+        response = await telegram_handler.api.call("setWebhook", json=data)
         result = response.json()
         
         return {
@@ -85,10 +129,7 @@ async def set_webhook():
 async def get_webhook_info():
     """Obtém informações do webhook atual"""
     try:
-        import requests
-        
-        url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/getWebhookInfo"
-        response = requests.get(url)
+        response = await telegram_handler.api.call("getWebhookInfo")
         result = response.json()
         
         return result
@@ -101,10 +142,7 @@ async def get_webhook_info():
 async def delete_webhook():
     """Remove o webhook do Telegram"""
     try:
-        import requests
-        
-        url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/deleteWebhook"
-        response = requests.post(url)
+        response = await telegram_handler.api.call("deleteWebhook")
         result = response.json()
         
         return {
@@ -120,10 +158,7 @@ async def delete_webhook():
 async def get_bot_info():
     """Obtém informações do bot"""
     try:
-        import requests
-        
-        url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/getMe"
-        response = requests.get(url)
+        response = await telegram_handler.api.call("getMe")
         result = response.json()
         
         return result
@@ -139,6 +174,8 @@ if __name__ == "__main__":
     print("📋 Endpoints disponíveis:")
     print("  - GET  / - Status do servidor")
     print("  - POST /webhook/telegram - Webhook do Telegram")
+    print("  - GET  /health - Servidor e modelo de transcrição prontos")
+    print("  - GET  /stats - Filas de processamento")
     print("  - GET  /set-webhook - Configurar webhook")
     print("  - GET  /get-webhook-info - Informações do webhook")
     print("  - GET  /delete-webhook - Remover webhook")
@@ -3,7 +3,10 @@ from fastapi.responses import JSONResponse
 import uvicorn
 import logging
 from telegram_handler_simple import TelegramHandlerSimple
-from config import TELEGRAM_TOKEN
+from telegram_webhook import TelegramWebhook
+from update_dispatcher import UpdateDispatcher
+from update_dedup import RecentIdIndex
+from config import TELEGRAM_TOKEN, WEBHOOK_WORKERS, MAX_CHATS_IN_FLIGHT, DEDUP_MAX_ENTRIES, DEDUP_TTL, INLINE_REPLY_TIMEOUT
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -19,6 +22,24 @@ if not TELEGRAM_TOKEN:
 # Inicializar handler do Telegram
 telegram_handler = TelegramHandlerSimple(TELEGRAM_TOKEN)
 
+# Processamento dos updates em segundo plano
+dispatcher = UpdateDispatcher(MAX_CHATS_IN_FLIGHT, WEBHOOK_WORKERS)
+webhook = TelegramWebhook(
+    telegram_handler,
+    dispatcher,
+    RecentIdIndex(DEDUP_MAX_ENTRIES, DEDUP_TTL),
+    INLINE_REPLY_TIMEOUT
+)
+
+@app.on_event("startup")
+async def startup():
+    await dispatcher.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await dispatcher.stop()
+    await telegram_handler.api.close()
+
 @app.get("/")
 async def root():
     """Endpoint raiz para verificar se o servidor está funcionando"""
@@ -32,34 +53,38 @@ async def root():
 async def telegram_webhook(request: Request):
     """Endpoint para receber webhooks do Telegram"""
     try:
-        # Obter dados da requisição
         update = await request.json()
-        logger.info(f"Webhook recebido: {update}")
-        
-        # Processar mensagem
-        response_text = telegram_handler.handle_message(update)
-        
-        # Enviar resposta
-        if response_text:
-            message = update.get("message", {})
-            chat_id = message.get("chat", {}).get("id")
-            if chat_id:
-                telegram_handler.send_message(chat_id, response_text)
-        
-        return JSONResponse(content={"status": "success"})
+    except Exception:
+        raise HTTPException(status_code=400, detail="JSON inválido")
     
-    except Exception as e:
-        logger.error(f"Erro no webhook: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    logger.info(f"Webhook recebido: {update}")
+    
+    if not webhook.is_valid(update):
+        return JSONResponse(content={"status": "ignored"})
+    
+    # Reentregas do Telegram (servidor lento) não chegam ao handler
+    if webhook.is_duplicate(update):
+        return JSONResponse(content={"status": "duplicate"})
+    
+    # Processamento acontece nos workers; respostas rápidas voltam inline
+    return JSONResponse(content=await webhook.dispatch(update))
+
+@app.get("/stats")
+async def get_stats():
+    """Profundidade e tempo de espera das filas de processamento"""
+    return {
+        "dispatcher": dispatcher.stats(),
+        "duplicates_dropped": webhook.dedup.duplicates,
+        "inline_replies": webhook.inline_replies,
+        "outbound": telegram_handler.outbox.stats(),
+        "file_id_cache": telegram_handler.file_ids.stats()
+    }
 
 @app.get("/bot-info")
 async def get_bot_info():
     """Obtém informações do bot"""
     try:
-        import requests
-        
-        url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/getMe"
-        response = requests.get(url)
+        response = await telegram_handler.api.call("getMe")
         result = response.json()
         
         return result
@@ -75,6 +100,7 @@ if __name__ == "__main__":
     print("📋 Endpoints disponíveis:")
     print("  - GET  / - Status do servidor")
     print("  - POST /webhook/telegram - Webhook do Telegram")
+    print("  - GET  /stats - Filas de processamento")
     print("  - GET  /bot-info - Informações do bot")
     print("\n💡 Para desenvolvimento local, use ngrok:")
     print("   ngrok http 8000")
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import threading
+from typing import Dict, Optional
+
+from update_dedup import RecentIdIndex
+from update_dispatcher import UpdateDispatcher
+
+logger = logging.getLogger(__name__)
+
+# Mídias sempre passam por download/processamento: nunca respondem a tempo inline
+SLOW_MESSAGE_TYPES = ("voice", "audio", "photo", "document", "video")
+
+class InlineReply:
+    """
+    Resposta que pode voltar no corpo da resposta do webhook.
+
+    Enquanto o endpoint ainda está aguardando, o worker entrega o texto aqui;
+    depois que o endpoint desiste, o worker envia a resposta pela Bot API.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiting = True
+        self.text: Optional[str] = None
+
+    def offer(self, text: str) -> bool:
+        """Chamado pelo worker: True se o endpoint vai responder inline"""
+        with self._lock:
+            if self._waiting:
+                self.text = text
+            return self._waiting
+
+    def close(self) -> Optional[str]:
+        """Chamado pelo endpoint: para de aguardar e retorna o texto, se houver"""
+        with self._lock:
+            self._waiting = False
+            return self.text
+
+class TelegramWebhook:
+    """
+    Ponte entre o endpoint do webhook e o handler do Telegram.
+
+    O endpoint só valida e enfileira o update; o processamento (e o envio da
+    resposta) acontece nos workers do dispatcher.
+    """
+
+    def __init__(
+        self,
+        handler,
+        dispatcher: UpdateDispatcher,
+        dedup: Optional[RecentIdIndex] = None,
+        reply_timeout: float = 0.0
+    ):
+        self.handler = handler
+        self.dispatcher = dispatcher
+        self.dedup = dedup or RecentIdIndex()
+        self.reply_timeout = reply_timeout  # espera máxima por uma resposta inline
+        self.inline_replies = 0
+
+    @staticmethod
+    def get_chat_id(update: Dict) -> Optional[int]:
+        """Extrai o chat_id de um update"""
+        return update.get("message", {}).get("chat", {}).get("id")
+
+    def is_valid(self, update) -> bool:
+        """Verifica se o update tem o formato esperado"""
+        if not isinstance(update, dict) or "update_id" not in update:
+            return False
+        return self.get_chat_id(update) is not None
+
+    def is_duplicate(self, update: Dict) -> bool:
+        """Verifica se o update é uma reentrega do Telegram"""
+        return self.dedup.seen(update["update_id"])
+
+    def can_reply_inline(self, update: Dict) -> bool:
+        """
+        Se vale segurar o webhook esperando a resposta.
+
+        Mídias, chats com updates ainda na fila e updates que o handler sabe
+        que são lentos (ex.: confirmação que gera o MIP) nunca ficam prontos
+        em `reply_timeout`; para eles o endpoint retorna na hora.
+        """
+        message = update.get("message", {})
+        if any(kind in message for kind in SLOW_MESSAGE_TYPES):
+            return False
+        if self.dispatcher.busy(self.get_chat_id(update)):
+            return False
+        is_slow_update = getattr(self.handler, "is_slow_update", None)
+        return not (is_slow_update and is_slow_update(update))
+
+    def enqueue(self, update: Dict, reply: Optional[InlineReply] = None):
+        """
+        Agenda o processamento do update na lane do chat.
+
+        Se o enfileiramento falhar, o update_id deixa de contar como visto:
+        o endpoint responde com erro e a reentrega do Telegram é aceita.
+        """
+        try:
+            return self.dispatcher.submit(self.get_chat_id(update), self.process_update, update, reply)
+        except Exception:
+            self.dedup.forget(update["update_id"])
+            raise
+
+    async def dispatch(self, update: Dict) -> Dict:
+        """
+        Enfileira o update e monta o corpo da resposta do webhook.
+
+        Se a resposta ficar pronta em até `reply_timeout` segundos, ela volta
+        como uma chamada sendMessage no próprio corpo da resposta, economizando
+        uma requisição à Bot API.
+        """
+        if self.reply_timeout <= 0 or not self.can_reply_inline(update):
+            self.enqueue(update)
+            return {"status": "queued"}
+
+        reply = InlineReply()
+        future = self.enqueue(update, reply)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.reply_timeout)
+        except Exception:
+            # Timeout ou erro: o worker envia (ou já enviou) pela Bot API
+            pass
+
+        text = reply.close()
+        if not text:
+            return {"status": "queued"}
+
+        self.inline_replies += 1
+        return {
+            "method": "sendMessage",
+            "chat_id": self.get_chat_id(update),
+            "text": text,
+            "parse_mode": "HTML"
+        }
+
+    async def process_update(self, update: Dict, reply: Optional[InlineReply] = None):
+        """Processa o update e envia a resposta (roda em um worker)"""
+        try:
+            response_text = await self.handler.handle_message(update)
+            if not response_text:
+                return
+            if reply is not None and reply.offer(response_text):
+                return
+            await self.handler.send_message(self.get_chat_id(update), response_text)
+        except Exception as e:
+            logger.error(f"Erro ao processar update {update.get('update_id')}: {e}")
@@ -0,0 +1,239 @@
+"""
+Motores de transcrição usados pelos workers do TranscriptionService.
+
+Todos devolvem o mesmo formato, consumido pelos handlers:
+{"text": str, "language": str, "segments": [{"start", "end", "text"}]}
+
+- openai-whisper: modelo original em PyTorch (fp32 na CPU)
+- faster-whisper: CTranslate2, com pesos quantizados (int8) na CPU
+
+Os lotes recebem trechos (caminho, início, duração): um áudio inteiro tem
+início 0 e duração None; áudios longos podem ser divididos em janelas. Cada
+trecho é decodificado uma única vez, em memória (audio_decoder), e tem os
+silêncios cortados (audio_vad) antes do modelo. Os tempos dos segmentos
+voltam sempre relativos ao início do arquivo original, e o resultado informa
+quanto áudio havia (`audio_seconds`) e quanto tinha voz (`speech_seconds`).
+"""
+
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from audio_decoder import SAMPLE_RATE, decode_audio
+from audio_vad import SpeechMap, trim_silence
+from config import VAD_ENABLED
+
+logger = logging.getLogger(__name__)
+
+Clip = Tuple[str, float, Optional[float]]
+
+# Padrões do whisper.transcribe, repetidos no caminho em lote
+TIME_PRECISION = 0.02  # segundos por token de tempo
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+def _prepare(clip: Clip) -> Tuple[np.ndarray, SpeechMap, float]:
+    """Decodifica o trecho e corta os silêncios"""
+    audio_path, start, duration = clip
+    audio = decode_audio(audio_path, start, duration)
+    seconds = len(audio) / SAMPLE_RATE
+    if VAD_ENABLED:
+        speech, speech_map = trim_silence(audio, SAMPLE_RATE, start)
+    else:
+        speech, speech_map = audio, SpeechMap([(0.0, seconds)], start)
+    return speech, speech_map, seconds
+
+def _remap(result: Dict, speech_map: SpeechMap, seconds: float) -> Dict:
+    """Leva os tempos dos segmentos de volta ao áudio original"""
+    for segment in result["segments"]:
+        segment["start"] = speech_map.to_original(segment["start"])
+        segment["end"] = speech_map.to_original(segment["end"])
+    result["audio_seconds"] = seconds
+    result["speech_seconds"] = speech_map.kept
+    return result
+
+def _needs_fallback(result) -> bool:
+    """Mesmo critério do `transcribe` para tentar uma temperatura maior"""
+    if result.no_speech_prob > NO_SPEECH_THRESHOLD:
+        return False  # provável silêncio: o transcribe não tenta de novo
+    return result.compression_ratio > COMPRESSION_RATIO_THRESHOLD or result.avg_logprob < LOGPROB_THRESHOLD
+
+def _is_silence(result) -> bool:
+    """Janela que o `transcribe` descartaria como silêncio"""
+    return result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob <= LOGPROB_THRESHOLD
+
+def _silent(seconds: float) -> Dict:
+    return {"text": "", "language": None, "segments": [], "audio_seconds": seconds, "speech_seconds": 0.0}
+
+class WhisperBackend:
+    """openai-whisper (PyTorch)"""
+
+    name = "openai-whisper"
+
+    def __init__(self, model_name: str, threads: int, compute_type: str = "float32"):
+        import torch
+        import whisper
+
+        torch.set_num_threads(threads)
+        self.model = whisper.load_model(model_name)
+        self.version = f"{self.name}-{whisper.__version__}-{model_name}"
+
+    def transcribe(self, audio) -> Dict:
+        """Transcreve um caminho ou um array float32 de 16 kHz"""
+        result = self.model.transcribe(audio)
+        return {
+            "text": result["text"],
+            "language": result.get("language"),
+            "segments": [
+                {"start": segment["start"], "end": segment["end"], "text": segment["text"]}
+                for segment in result.get("segments", [])
+            ]
+        }
+
+    def transcribe_batch(self, clips: List[Clip]) -> List:
+        """
+        Trechos de até 30s (uma janela do Whisper) passam juntos por um único
+        `whisper.decode` com o lote de espectrogramas; os mais longos usam o
+        `transcribe` normal. O resultado tem o mesmo formato do `transcribe`
+        (segmentos com tempos): o lote decodifica com timestamps na
+        temperatura 0, e os trechos em que o `transcribe` tentaria outra
+        temperatura (texto repetitivo ou de baixa confiança) são refeitos por
+        ele. Retorna, na mesma ordem, o resultado de cada trecho ou a exceção
+        que ele gerou.
+        """
+        import torch
+        import whisper
+
+        if len(clips) == 1:
+            return [_safe(self, clips[0])]
+
+        results: List = [None] * len(clips)
+        short = []
+        mels = []
+        for i, clip in enumerate(clips):
+            try:
+                speech, speech_map, seconds = _prepare(clip)
+                if not len(speech):
+                    results[i] = _silent(seconds)
+                elif len(speech) > whisper.audio.N_SAMPLES:
+                    results[i] = _remap(self.transcribe(speech), speech_map, seconds)
+                else:
+                    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(speech), n_mels=self.model.dims.n_mels)
+                    mels.append(mel.to(self.model.device))
+                    short.append((i, speech, speech_map, seconds))
+            except Exception as e:
+                results[i] = RuntimeError(f"{clip[0]}: {e}")
+
+        if mels:
+            options = whisper.DecodingOptions(fp16=False, temperature=0.0)
+            try:
+                decoded = whisper.decode(self.model, torch.stack(mels), options)
+            except Exception as e:
+                decoded = [RuntimeError(str(e))] * len(mels)
+            for (i, speech, speech_map, seconds), result in zip(short, decoded):
+                try:
+                    if isinstance(result, Exception):
+                        raise result
+                    if _is_silence(result):
+                        transcription = {"text": "", "language": result.language, "segments": []}
+                    elif _needs_fallback(result):
+                        transcription = self.transcribe(speech)
+                    else:
+                        transcription = self._from_decoding(result, len(speech) / SAMPLE_RATE)
+                    results[i] = _remap(transcription, speech_map, seconds)
+                except Exception as e:
+                    results[i] = RuntimeError(f"{clips[i][0]}: {e}")
+        return results
+
+    def _from_decoding(self, result, duration: float) -> Dict:
+        """Monta os segmentos a partir dos tokens de tempo, como o `transcribe` faz"""
+        import whisper
+
+        tokenizer = whisper.tokenizer.get_tokenizer(
+            self.model.is_multilingual,
+            num_languages=self.model.num_languages,
+            language=result.language,
+            task="transcribe"
+        )
+        segments = []
+        start = None
+        text_tokens = []
+        for token in result.tokens:
+            if token < tokenizer.timestamp_begin:
+                text_tokens.append(token)
+                continue
+            moment = (token - tokenizer.timestamp_begin) * TIME_PRECISION
+            if start is not None and text_tokens:
+                segments.append({"start": start, "end": moment, "text": tokenizer.decode(text_tokens)})
+                text_tokens = []
+                start = None
+            else:
+                start = moment
+        if text_tokens:
+            # Último segmento sem o tempo de fim: vai até o fim do trecho
+            segments.append({"start": start or 0.0, "end": duration, "text": tokenizer.decode(text_tokens)})
+        return {
+            "text": "".join(segment["text"] for segment in segments),
+            "language": result.language,
+            "segments": segments
+        }
+
+class FasterWhisperBackend:
+    """faster-whisper (CTranslate2), por padrão com pesos int8"""
+
+    name = "faster-whisper"
+
+    def __init__(self, model_name: str, threads: int, compute_type: str = "int8"):
+        import faster_whisper
+
+        self.model = faster_whisper.WhisperModel(
+            model_name,
+            device="cpu",
+            compute_type=compute_type,
+            cpu_threads=threads
+        )
+        self.version = f"{self.name}-{faster_whisper.__version__}-{model_name}-{compute_type}"
+
+    def transcribe(self, audio) -> Dict:
+        """Transcreve um caminho ou um array float32 de 16 kHz"""
+        segments, info = self.model.transcribe(audio)
+        segments = [
+            {"start": segment.start, "end": segment.end, "text": segment.text}
+            for segment in segments  # gerador: a decodificação acontece aqui
+        ]
+        return {
+            "text": "".join(segment["text"] for segment in segments),
+            "language": info.language,
+            "segments": segments
+        }
+
+    def transcribe_batch(self, clips: List[Clip]) -> List:
+        # O CTranslate2 já paraleliza cada trecho entre as threads da CPU
+        return [_safe(self, clip) for clip in clips]
+
+def _safe(backend, clip: Clip):
+    """Transcreve um trecho isolado, devolvendo a exceção em vez de levantá-la"""
+    try:
+        speech, speech_map, seconds = _prepare(clip)
+        if not len(speech):
+            return _silent(seconds)
+        return _remap(backend.transcribe(speech), speech_map, seconds)
+    except Exception as e:
+        return RuntimeError(f"{clip[0]}: {e}")
+
+BACKENDS = {
+    WhisperBackend.name: WhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend
+}
+
+def load_backend(backend_name: str, model_name: str, threads: int, compute_type: str):
+    """Instancia o motor configurado (WHISPER_BACKEND)"""
+    try:
+        backend_class = BACKENDS[backend_name]
+    except KeyError:
+        raise ValueError(f"WHISPER_BACKEND inválido: {backend_name} (opções: {', '.join(BACKENDS)})")
+    backend = backend_class(model_name, threads, compute_type)
+    logger.info(f"Motor de transcrição carregado: {backend.version}")
+    return backend
@@ -0,0 +1,61 @@
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+class TranscriptionCache:
+    """
+    Cache persistente (SQLite) de transcrições já feitas.
+
+    A chave combina a versão do motor/modelo com a identidade do áudio
+    (`file_unique_id` do Telegram ou hash do conteúdo), então trocar de
+    modelo não reaproveita resultados antigos. Guarda no máximo
+    `max_entries` transcrições, descartando as usadas há mais tempo.
+    """
+
+    def __init__(self, db_path, max_entries: int = 5000):
+        self.max_entries = max_entries
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS transcriptions ("
+            "key TEXT PRIMARY KEY, result TEXT NOT NULL, used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS transcriptions_used ON transcriptions (used)")
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute("SELECT result FROM transcriptions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE transcriptions SET used = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, key: str, result: Dict):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO transcriptions (key, result, used) VALUES (?, ?, ?)",
+                (key, json.dumps(result, ensure_ascii=False), time.time())
+            )
+            self._db.execute(
+                "DELETE FROM transcriptions WHERE key IN ("
+                "SELECT key FROM transcriptions ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM transcriptions").fetchone()[0]
+        return {"entries": entries, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,412 @@
+import asyncio
+import heapq
+import importlib.metadata
+import itertools
+import logging
+import multiprocessing
+import math
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from config import (
+    WHISPER_BACKEND,
+    WHISPER_MODEL,
+    WHISPER_DRAFT_MODEL,
+    WHISPER_COMPUTE_TYPE,
+    TRANSCRIPTION_WORKERS,
+    TORCH_THREADS,
+    TRANSCRIPTION_BATCH_SIZE,
+    TRANSCRIPTION_BATCH_WAIT,
+    TRANSCRIPTION_CACHE_PATH,
+    TRANSCRIPTION_CACHE_SIZE,
+    TRANSCRIPTION_WINDOW_SECONDS,
+    TRANSCRIPTION_AGING_RATE,
+    TRANSCRIPTION_DEFAULT_DURATION,
+    VAD_ENABLED,
+    VAD_MIN_SILENCE,
+    VAD_PADDING
+)
+from transcription_cache import TranscriptionCache
+
+logger = logging.getLogger(__name__)
+
+# Estado de cada processo worker (carregado uma única vez no initializer)
+_backends: Dict[str, object] = {}  # nome do modelo -> motor carregado
+
+def _init_worker(backend_name: str, model_names: List[str], threads: int, compute_type: str):
+    """Carrega os modelos (principal e rascunho) no processo worker"""
+    from transcription_backends import load_backend
+
+    for model_name in model_names:
+        _backends[model_name] = load_backend(backend_name, model_name, threads, compute_type)
+    logger.info(f"Worker de transcrição pronto (modelos {', '.join(model_names)}, {threads} thread(s))")
+
+def _ping() -> bool:
+    """Tarefa vazia usada para subir os workers e carregar o modelo"""
+    return bool(_backends)
+
+def _transcribe_batch(model_name: str, clips: List[Tuple[str, float, Optional[float]]]) -> List:
+    """Transcreve um lote de trechos de áudio (roda no processo worker)"""
+    return _backends[model_name].transcribe_batch(clips)
+
+def merge_results(results: List[Dict]) -> Dict:
+    """Junta os resultados das janelas de um mesmo áudio, em ordem"""
+    return {
+        "text": " ".join(result["text"].strip() for result in results if result["text"].strip()),
+        "language": next((result["language"] for result in results if result.get("language")), None),
+        "segments": [segment for result in results for segment in result["segments"]]
+    }
+
+# Motores que decodificam um lote de trechos de uma vez; nos outros cada
+# trecho é transcrito sozinho e o lote só atrasaria os resultados
+BATCHED_BACKENDS = ("openai-whisper",)
+# Só entram em lote trechos que cabem numa janela do Whisper (N_SAMPLES); os
+# maiores, ou sem duração conhecida, passam por um `transcribe` inteiro e vão sozinhos
+BATCH_MAX_DURATION = 30
+
+# Faixas de duração usadas nas estatísticas de espera (limite superior em segundos)
+PRIORITY_CLASSES = (("short", 30), ("medium", 120), ("long", float("inf")))
+
+class _Job:
+    """
+    Trecho de áudio na fila de transcrição.
+
+    A prioridade é "menor áudio primeiro com envelhecimento": na hora t, um
+    trabalho vale `duração - aging_rate * (t - entrada)`. Como t é o mesmo
+    para todos, a ordem não muda com o tempo e a chave pode ser fixa:
+    `duração + aging_rate * entrada`.
+    """
+
+    _sequence = itertools.count()
+
+    def __init__(self, clip: Tuple[str, float, Optional[float]], future: Future,
+                 duration: float, aging_rate: float, model_name: str):
+        self.clip = clip
+        self.future = future
+        self.model_name = model_name
+        self.duration = duration
+        self.enqueued = time.monotonic()
+        self.key = (duration + aging_rate * self.enqueued, next(self._sequence))
+        self.priority_class = next(name for name, limit in PRIORITY_CLASSES if duration < limit)
+
+    def __lt__(self, other: "_Job") -> bool:
+        return self.key < other.key
+
+class TranscriptionService:
+    """
+    Pool de processos dedicados à transcrição com Whisper.
+
+    O motor (openai-whisper ou faster-whisper int8) é escolhido em
+    WHISPER_BACKEND/WHISPER_COMPUTE_TYPE; o formato do resultado é o mesmo.
+
+    Cada processo carrega o modelo uma vez; os servidores web só enviam o
+    caminho do áudio e recebem um future com o resultado, sem carregar o
+    modelo nem disputar o GIL com o event loop.
+
+    Nada de torch/whisper é importado no processo do servidor: os workers
+    sobem sob demanda, ou em segundo plano com `start()`. `ready` indica se
+    algum worker já está com o modelo carregado.
+
+    Os pedidos passam por um agrupador: uma thread junta os áudios que chegam
+    em até `batch_wait` segundos (ou até `batch_size`) e manda o lote para um
+    worker livre. Com todos os workers ocupados o lote continua crescendo até
+    um deles liberar. Só o openai-whisper decodifica lotes; com o
+    faster-whisper cada áudio vai sozinho (lote de 1).
+
+    Com `cache_key` (file_unique_id ou hash do conteúdo), o resultado fica
+    guardado no TranscriptionCache e o mesmo áudio não é transcrito de novo.
+
+    Áudios longos podem ser transcritos por janelas com `transcribe_windows`,
+    que entrega o resultado de cada janela assim que ela termina.
+
+    A fila é de prioridade (ver _Job): uma nota de voz de 5s não espera atrás
+    de uma gravação de 10 minutos, mas a gravação ganha prioridade conforme
+    espera. O pool recebe no máximo um lote por worker, então a ordem da fila
+    é a ordem real de execução.
+
+    Com `draft_model`, cada worker carrega também um modelo pequeno: os
+    handlers pedem um rascunho rápido (`model=service.draft_model`) e o
+    resultado do modelo principal chega depois. `stats()` mede o tempo até o
+    resultado de cada um separadamente.
+    """
+
+    def __init__(
+        self,
+        num_workers: int = TRANSCRIPTION_WORKERS,
+        model_name: str = WHISPER_MODEL,
+        draft_model: Optional[str] = WHISPER_DRAFT_MODEL,
+        threads: int = TORCH_THREADS,
+        backend: str = WHISPER_BACKEND,
+        compute_type: str = WHISPER_COMPUTE_TYPE,
+        batch_size: int = TRANSCRIPTION_BATCH_SIZE,
+        batch_wait: float = TRANSCRIPTION_BATCH_WAIT,
+        cache_size: int = TRANSCRIPTION_CACHE_SIZE,
+        aging_rate: float = TRANSCRIPTION_AGING_RATE
+    ):
+        self.num_workers = num_workers
+        self.model_name = model_name
+        self.draft_model = draft_model if draft_model and draft_model != model_name else None
+        self.backend = backend
+        # Tudo que muda o texto transcrito entra na chave do cache
+        vad = f"vad-{VAD_MIN_SILENCE}-{VAD_PADDING}" if VAD_ENABLED else "sem-vad"
+        self.version = f"{backend}-{_package_version(backend)}:{model_name}:{compute_type}:{vad}"
+        self.cache = TranscriptionCache(TRANSCRIPTION_CACHE_PATH, cache_size) if cache_size > 0 else None
+        self.batch_size = max(1, batch_size) if backend in BATCHED_BACKENDS else 1
+        self.batch_wait = batch_wait
+        self.aging_rate = aging_rate
+        self.ready = False
+        self._warming_up = False
+        self._executor = ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=multiprocessing.get_context("spawn"),  # torch não é seguro com fork
+            initializer=_init_worker,
+            initargs=(backend, [model_name] + ([self.draft_model] if self.draft_model else []), threads, compute_type)
+        )
+
+        self._pending: List[_Job] = []  # heap por prioridade
+        self._condition = threading.Condition()
+        self._free_workers = threading.Semaphore(num_workers)
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+        self.batches = 0
+        self.clips = 0
+        self.audio_seconds = 0.0  # áudio recebido pelos workers
+        self.speech_seconds = 0.0  # o que sobrou depois do corte de silêncio
+        self._waits = {name: [0, 0.0, 0.0] for name, _ in PRIORITY_CLASSES}  # trabalhos, espera total, máxima
+        self._latencies = {"draft": [0, 0.0], "final": [0, 0.0]}  # áudios, tempo total até o resultado
+
+    def start(self):
+        """Sobe os workers e carrega o modelo em segundo plano (não bloqueia)"""
+        if self._warming_up or self.ready:
+            return
+        self._warming_up = True
+        logger.info(f"Carregando modelo {self.backend} '{self.model_name}' em segundo plano...")
+        for _ in range(self.num_workers):
+            self._executor.submit(_ping).add_done_callback(self._mark_ready)
+
+    def lookup(self, cache_key: str) -> Optional[Dict]:
+        """Transcrição já feita para este áudio, se houver"""
+        if self.cache is None:
+            return None
+        return self.cache.get(f"{self.version}:{cache_key}")
+
+    def submit(self, audio_path: str, cache_key: Optional[str] = None,
+               duration: Optional[float] = None, model: Optional[str] = None) -> Future:
+        """
+        Enfileira um áudio para transcrição (entra no próximo lote).
+
+        `duration` (segundos, dos metadados da mensagem) define a prioridade.
+        `model` escolhe o rascunho (`draft_model`); o padrão é o modelo
+        principal. Só o resultado do modelo principal vai para o cache.
+        """
+        future: Future = Future()
+        if model is not None and model != self.model_name:
+            if model != self.draft_model:
+                raise ValueError(f"Modelo não carregado nos workers: {model}")
+            return self._enqueue((str(audio_path), 0.0, None), future, duration, model)
+        if cache_key is not None and self.cache is not None:
+            cached = self.lookup(cache_key)
+            if cached is not None:
+                future.set_result(cached)
+                return future
+            future.add_done_callback(lambda done: self._store(cache_key, done))
+        return self._enqueue((str(audio_path), 0.0, None), future, duration)
+
+    async def transcribe(self, audio_path: str, cache_key: Optional[str] = None,
+                         duration: Optional[float] = None, model: Optional[str] = None) -> Dict:
+        """Transcreve um áudio sem bloquear o event loop"""
+        return await asyncio.wrap_future(self.submit(audio_path, cache_key, duration, model))
+
+    async def transcribe_windows(self, audio_path: str, duration: float, cache_key: Optional[str] = None,
+                                 window: int = TRANSCRIPTION_WINDOW_SECONDS) -> AsyncIterator[Dict]:
+        """
+        Transcreve o áudio por janelas de `window` segundos, em ordem.
+
+        Cada janela só entra na fila depois que a anterior termina: o primeiro
+        resultado chega após uma janela e, entre elas, áudios de outros chats
+        também são atendidos. O resultado completo vai para o cache no final.
+        """
+        cached = self.lookup(cache_key) if cache_key is not None else None
+        if cached is not None:
+            yield cached
+            return
+
+        results = []
+        count = max(1, math.ceil(duration / window))
+        for index in range(count):
+            # A última janela vai até o fim do arquivo (a duração informada é arredondada)
+            clip = (str(audio_path), float(index * window), float(window) if index < count - 1 else None)
+            result = await asyncio.wrap_future(self._enqueue(clip, Future(), min(window, duration - index * window)))
+            results.append(result)
+            yield result
+
+        if cache_key is not None and self.cache is not None:
+            self.cache.put(f"{self.version}:{cache_key}", merge_results(results))
+
+    def _enqueue(self, clip: Tuple[str, float, Optional[float]], future: Future,
+                 duration: Optional[float], model_name: Optional[str] = None) -> Future:
+        if not duration:
+            duration = TRANSCRIPTION_DEFAULT_DURATION
+        job = _Job(clip, future, duration, self.aging_rate, model_name or self.model_name)
+
+        tier = "final" if job.model_name == self.model_name else "draft"
+        future.add_done_callback(lambda done: self._record_latency(tier, job.enqueued))
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Serviço de transcrição encerrado")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._collect, name="transcription-batcher", daemon=True)
+                self._thread.start()
+            heapq.heappush(self._pending, job)
+            self._condition.notify()
+        return future
+
+    def _record_latency(self, tier: str, enqueued: float):
+        latency = self._latencies[tier]
+        latency[0] += 1
+        latency[1] += time.monotonic() - enqueued
+
+    def _store(self, cache_key: str, future: Future):
+        if future.exception() is None:
+            self.cache.put(f"{self.version}:{cache_key}", future.result())
+
+    def stats(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "clips": self.clips,
+            "avg_batch_size": round(self.clips / self.batches, 2) if self.batches else 0.0,
+            "audio_seconds": round(self.audio_seconds, 1),
+            "silence_removed_seconds": round(self.audio_seconds - self.speech_seconds, 1),
+            "wait_by_class": {
+                name: {
+                    "jobs": jobs,
+                    "avg_wait": round(total / jobs, 3) if jobs else 0.0,
+                    "max_wait": round(longest, 3)
+                }
+                for name, (jobs, total, longest) in self._waits.items()
+            },
+            # Tempo da entrada na fila até o resultado: rascunho vs modelo principal
+            "time_to_draft": round(self._latencies["draft"][1] / self._latencies["draft"][0], 3)
+            if self._latencies["draft"][0] else None,
+            "time_to_final": round(self._latencies["final"][1] / self._latencies["final"][0], 3)
+            if self._latencies["final"][0] else None,
+            "cache": self.cache.stats() if self.cache else None
+        }
+
+    def _collect(self):
+        """Thread do agrupador: forma os lotes e os envia ao pool"""
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                deadline = time.monotonic() + self.batch_wait
+                while len(self._pending) < self.batch_size and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+
+            # Espera um worker livre; enquanto isso mais áudios entram no lote
+            self._free_workers.acquire()
+            with self._condition:
+                batch = self._take_batch()
+            self._run_batch(batch)
+
+    def _take_batch(self) -> List[_Job]:
+        """
+        Tira da fila os trabalhos de maior prioridade que usam o mesmo modelo
+        do primeiro e cabem numa janela (BATCH_MAX_DURATION); um trabalho
+        maior vai sozinho, para as notas curtas não esperarem por ele.
+        """
+        batch = [heapq.heappop(self._pending)]
+        if batch[0].duration > BATCH_MAX_DURATION:
+            return batch
+        skipped = []
+        while self._pending and len(batch) < self.batch_size:
+            job = heapq.heappop(self._pending)
+            fits = job.model_name == batch[0].model_name and job.duration <= BATCH_MAX_DURATION
+            (batch if fits else skipped).append(job)
+        for job in skipped:
+            heapq.heappush(self._pending, job)
+        return batch
+
+    def _run_batch(self, batch: List[_Job]):
+        self.batches += 1
+        self.clips += len(batch)
+        now = time.monotonic()
+        for item in batch:
+            waits = self._waits[item.priority_class]
+            wait = now - item.enqueued
+            waits[0] += 1
+            waits[1] += wait
+            waits[2] = max(waits[2], wait)
+        try:
+            job = self._executor.submit(_transcribe_batch, batch[0].model_name, [item.clip for item in batch])
+        except Exception as e:
+            self._free_workers.release()
+            for item in batch:
+                item.future.set_exception(e)
+            return
+
+        def deliver(job: Future):
+            self._free_workers.release()
+            try:
+                results = job.result()
+            except Exception as e:
+                results = [e] * len(batch)
+            for item, result in zip(batch, results):
+                if isinstance(result, Exception):
+                    item.future.set_exception(result)
+                else:
+                    self.audio_seconds += result.get("audio_seconds", 0.0)
+                    self.speech_seconds += result.get("speech_seconds", 0.0)
+                    item.future.set_result(result)
+
+        job.add_done_callback(self._mark_ready)
+        job.add_done_callback(deliver)
+
+    def _mark_ready(self, future: Future):
+        if self.ready:
+            return
+        try:
+            future.result()
+        except Exception as e:
+            logger.error(f"Worker de transcrição indisponível: {e}")
+            return
+        self.ready = True
+        logger.info("Serviço de transcrição pronto")
+
+    def shutdown(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        if self.cache is not None:
+            self.cache.close()
+
+def _package_version(backend: str) -> str:
+    """Versão instalada do pacote do motor, sem importá-lo (evita carregar o torch)"""
+    try:
+        return importlib.metadata.version(backend)
+    except importlib.metadata.PackageNotFoundError:
+        return "?"
+
+_service: Optional[TranscriptionService] = None
+_service_lock = threading.Lock()
+
+def get_transcription_service() -> TranscriptionService:
+    """Retorna o serviço de transcrição compartilhado do processo"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = TranscriptionService()
+        return _service
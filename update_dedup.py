@@ -0,0 +1,51 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+class RecentIdIndex:
+    """
+    Índice limitado dos IDs vistos recentemente (update_id, MessageSid).
+
+    Usado para descartar reentregas do webhook antes de chegarem aos handlers.
+    Cada verificação é O(1) e o índice guarda no máximo `max_entries` IDs;
+    IDs mais antigos que `ttl` segundos expiram.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, float]" = OrderedDict()  # id -> visto em
+        self._lock = threading.Lock()
+        self.duplicates = 0
+
+    def seen(self, key: Hashable) -> bool:
+        """Registra o ID e informa se ele já tinha sido visto"""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+
+            if key in self._entries:
+                self.duplicates += 1
+                return True
+
+            self._entries[key] = now
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return False
+
+    def forget(self, key: Hashable):
+        """Remove o ID (o update não chegou a ser enfileirado e a reentrega deve passar)"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _expire(self, now: float):
+        # Entradas ficam em ordem de inserção: basta olhar o início
+        while self._entries:
+            key, seen_at = next(iter(self._entries.items()))
+            if now - seen_at < self.ttl:
+                break
+            self._entries.popitem(last=False)
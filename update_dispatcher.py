@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+class UpdateDispatcher:
+    """
+    Fila de updates processados em segundo plano por um pool de workers.
+
+    O webhook apenas enfileira o trabalho e retorna; o download, a transcrição
+    e a geração de documentos rodam nos workers, sem bloquear o event loop.
+
+    Os updates são separados em filas ("lanes") por chave (chat_id no Telegram,
+    número no WhatsApp): updates da mesma lane rodam estritamente em ordem,
+    lanes diferentes rodam em paralelo.
+    """
+
+    def __init__(self, num_workers: int = 4, executor_workers: int = None):
+        self.num_workers = num_workers
+        # Threads para chamadas síncronas; corrotinas rodam direto no event loop
+        self._executor = ThreadPoolExecutor(
+            max_workers=executor_workers or num_workers,
+            thread_name_prefix="update-worker"
+        )
+        self._lanes: Dict[Hashable, Deque] = {}  # chave -> itens pendentes
+        self._running: Dict[Hashable, float] = {}  # chave -> início do item atual
+        self._ready: asyncio.Queue = None  # lanes com trabalho e sem worker
+        self._workers = []
+
+        # Estatísticas de espera na fila
+        self._processed = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    async def start(self):
+        """Inicia os workers (deve ser chamado com o event loop rodando)"""
+        if self._workers:
+            return
+        self._ready = asyncio.Queue()
+        self._workers = [
+            asyncio.create_task(self._worker(i)) for i in range(self.num_workers)
+        ]
+        logger.info(f"Dispatcher iniciado com {self.num_workers} worker(s)")
+
+    async def stop(self):
+        """Aguarda os updates pendentes e encerra os workers"""
+        if not self._workers:
+            return
+        await self._ready.join()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._executor.shutdown(wait=True)
+
+    def submit(self, key: Hashable, fn: Callable, *args: Any) -> asyncio.Future:
+        """Enfileira uma chamada na lane `key` e retorna um future com o resultado"""
+        if self._ready is None:
+            raise RuntimeError("Dispatcher não iniciado")
+        future = asyncio.get_running_loop().create_future()
+        item = (fn, args, future, time.monotonic())
+
+        lane = self._lanes.get(key)
+        if lane is None:
+            self._lanes[key] = deque([item])
+            self._ready.put_nowait(key)
+        else:
+            # A lane já está na fila ou em execução; o worker a reagenda
+            lane.append(item)
+        return future
+
+    def busy(self, key: Hashable) -> bool:
+        """True se a lane `key` já tem um update na fila ou em execução"""
+        return key in self._lanes
+
+    def pending(self) -> int:
+        """Quantidade de updates aguardando um worker"""
+        return sum(len(lane) for lane in self._lanes.values())
+
+    def stats(self, top: int = 10) -> Dict:
+        """Profundidade e tempo de espera das lanes (as mais carregadas primeiro)"""
+        now = time.monotonic()
+        lanes = []
+        for key, lane in self._lanes.items():
+            lanes.append({
+                "key": key,
+                "depth": len(lane),
+                "running": key in self._running,
+                "oldest_wait": round(now - lane[0][3], 3) if lane else 0.0
+            })
+        lanes.sort(key=lambda item: (item["depth"], item["oldest_wait"]), reverse=True)
+
+        return {
+            "workers": self.num_workers,
+            "pending": self.pending(),
+            "active_lanes": len(self._lanes),
+            "running": len(self._running),
+            "processed": self._processed,
+            "avg_wait": round(self._total_wait / self._processed, 3) if self._processed else 0.0,
+            "max_wait": round(self._max_wait, 3),
+            "lanes": lanes[:top]
+        }
+
+    async def _worker(self, index: int):
+        loop = asyncio.get_running_loop()
+        while True:
+            key = await self._ready.get()
+            lane = self._lanes[key]
+            fn, args, future, enqueued_at = lane.popleft()
+            try:
+                started_at = time.monotonic()
+                self._running[key] = started_at
+                self._record_wait(started_at - enqueued_at)
+
+                if asyncio.iscoroutinefunction(fn):
+                    result = await fn(*args)
+                else:
+                    result = await loop.run_in_executor(self._executor, fn, *args)
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                logger.error(f"Erro ao processar update da lane {key} no worker {index}: {e}")
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                del self._running[key]
+                if lane:
+                    # Volta para o fim da fila para não monopolizar os workers
+                    self._ready.put_nowait(key)
+                else:
+                    del self._lanes[key]
+                self._ready.task_done()
+
+    def _record_wait(self, wait: float):
+        self._processed += 1
+        self._total_wait += wait
+        self._max_wait = max(self._max_wait, wait)
+        if wait > 1:
+            logger.debug(f"Update aguardou {wait:.2f}s na fila")
@@ -4,9 +4,12 @@ from datetime import datetime, timedelta
 import logging
 from pathlib import Path
 import requests
-from pydub import AudioSegment
 import json
-from image_processor import ImageProcessor
+import re
+import threading
+import uuid
+from image_pipeline import get_image_pipeline
+from download_utils import CHUNK_SIZE, DownloadTooLarge, atomic_open, check_size
 
 logger = logging.getLogger(__name__)
 
@@ -17,28 +20,32 @@ class WhatsAppHandler:
             os.getenv("TWILIO_AUTH_TOKEN")
         )
         self.sessions = {}
+        self._sessions_lock = threading.Lock()  # mensagens de números diferentes rodam em threads paralelas
         self.session_timeout = int(os.getenv("SESSION_TIMEOUT", 120))
-        self.image_processor = ImageProcessor()
+        self.image_pipeline = get_image_pipeline()  # processamento em paralelo, mantendo a ordem
 
     def _download_media(self, media_url, file_path):
-        """Download mídia do WhatsApp"""
-        response = requests.get(
-            media_url,
-            auth=(
-                os.getenv("TWILIO_ACCOUNT_SID"),
-                os.getenv("TWILIO_AUTH_TOKEN")
-            )
-        )
-        if response.status_code == 200:
-            with open(file_path, 'wb') as f:
-                f.write(response.content)
+        """Download mídia do WhatsApp (em partes, direto para o disco)"""
+        try:
+            with requests.get(
+                media_url,
+                auth=(
+                    os.getenv("TWILIO_ACCOUNT_SID"),
+                    os.getenv("TWILIO_AUTH_TOKEN")
+                ),
+                stream=True,
+                timeout=(10, 120)
+            ) as response:
+                if response.status_code != 200:
+                    return False
+                check_size(response.headers.get("Content-Length"))
+                with atomic_open(file_path) as f:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        f.write(chunk)
             return True
-        return False
-
-    def _convert_audio(self, input_path, output_path):
-        """Converte áudio do WhatsApp para formato compatível com Whisper"""
-        audio = AudioSegment.from_file(input_path)
-        audio.export(output_path, format="wav")
+        except DownloadTooLarge as e:
+            logger.warning(f"Download rejeitado: {e}")
+            return False
 
     def handle_message(self, from_number, message_type, media_url=None, message_text=None):
         """Processa mensagens recebidas do WhatsApp"""
@@ -66,11 +73,10 @@ class WhatsAppHandler:
             
         elif message_type == "audio":
             # Processar áudio
-            audio_path = Path(f"uploads/audio_{datetime.now().strftime('%Y%m%d_%H%M%S')}.ogg")
+            audio_path = Path(f"uploads/audio_{self._file_tag(from_number)}.ogg")
             if self._download_media(media_url, audio_path):
-                wav_path = audio_path.with_suffix('.wav')
-                self._convert_audio(audio_path, wav_path)
-                session['audio_path'] = str(wav_path)
+                # O OGG vai direto para a transcrição (decodificado em memória no worker)
+                session['audio_path'] = str(audio_path)
                 
                 # Se estiver no modo batch e esperando áudio
                 if session.get('mode') == 'batch' and session.get('status') == 'waiting_audio':
@@ -83,67 +89,73 @@ class WhatsAppHandler:
             
         elif message_type == "image":
             # Processar imagem
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            original_path = Path(f"uploads/original_image_{timestamp}.jpg")
+            tag = self._file_tag(from_number)
+            index = len(session['images'])
+            original_path = Path(f"uploads/original_image_{tag}_{index}.jpg")
             
             if self._download_media(media_url, original_path):
-                # Processar e otimizar a imagem
-                processed_path = Path(f"uploads/processed_image_{timestamp}.jpg")
-                if self.image_processor.process_image(str(original_path), str(processed_path)):
-                    session['images'].append(str(processed_path))
-                    
-                    # Remover imagem original após processamento
-                    try:
-                        original_path.unlink()
-                    except:
-                        pass
-                    
-                    # No modo batch, apenas confirma o recebimento
-                    if session.get('mode') == 'batch' and session.get('status') == 'waiting_images':
+                # Processar e otimizar a imagem em segundo plano (a posição na lista já fica reservada;
+                # o original é removido após o processamento)
+                processed_path = Path(f"uploads/processed_image_{tag}_{index}.jpg")
+                self.image_pipeline.submit(session, original_path, processed_path)
+                
+                # No modo batch, apenas confirma o recebimento
+                if session.get('mode') == 'batch' and session.get('status') == 'waiting_images':
+                    self.send_message(
+                        from_number,
+                        f"Imagem {len(session['images'])} recebida. Continue enviando as imagens ou envie 'pronto' quando terminar."
+                    )
+                    return True
+                
+                # No modo sequencial, verifica se completou todos os passos
+                elif session.get('mode') == 'sequential' and session.get('status') == 'waiting_images':
+                    if 'mip_session' in session and len(session['images']) == len(session['mip_session'].steps):
+                        return True
+                    else:
                         self.send_message(
                             from_number,
-                            f"Imagem {len(session['images'])} recebida e processada. Continue enviando as imagens ou envie 'pronto' quando terminar."
+                            "Imagem recebida. Continue enviando as imagens na ordem dos passos."
                         )
                         return True
-                    
-                    # No modo sequencial, verifica se completou todos os passos
-                    elif session.get('mode') == 'sequential' and session.get('status') == 'waiting_images':
-                        if 'mip_session' in session and len(session['images']) == len(session['mip_session'].steps):
-                            return True
-                        else:
-                            self.send_message(
-                                from_number,
-                                "Imagem recebida e processada. Continue enviando as imagens na ordem dos passos."
-                            )
-                            return True
             
         return False
 
+    def _file_tag(self, from_number):
+        """
+        Parte única do nome dos arquivos de uma mensagem.
+
+        Números diferentes são atendidos em paralelo: só o horário não basta
+        para separar os arquivos de dois usuários que enviam no mesmo segundo.
+        """
+        number = re.sub(r"\D", "", from_number or "")
+        return f"{number}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
     def _get_or_create_session(self, from_number):
         """Gerencia sessões de usuário"""
-        now = datetime.now()
-        
-        # Limpar sessões expiradas
-        expired = [
-            number for number, session in self.sessions.items()
-            if (now - session['last_update']) > timedelta(seconds=self.session_timeout)
-        ]
-        for number in expired:
-            del self.sessions[number]
-        
-        # Criar ou atualizar sessão
-        if from_number not in self.sessions:
-            self.sessions[from_number] = {
-                'images': [],
-                'audio_path': None,
-                'last_update': now,
-                'mode': None,  # 'batch' ou 'sequential'
-                'status': None  # 'waiting_images', 'waiting_audio'
-            }
-        else:
-            self.sessions[from_number]['last_update'] = now
+        with self._sessions_lock:
+            now = datetime.now()
             
-        return self.sessions[from_number]
+            # Limpar sessões expiradas
+            expired = [
+                number for number, session in self.sessions.items()
+                if (now - session['last_update']) > timedelta(seconds=self.session_timeout)
+            ]
+            for number in expired:
+                del self.sessions[number]
+            
+            # Criar ou atualizar sessão
+            if from_number not in self.sessions:
+                self.sessions[from_number] = {
+                    'images': [],
+                    'audio_path': None,
+                    'last_update': now,
+                    'mode': None,  # 'batch' ou 'sequential'
+                    'status': None  # 'waiting_images', 'waiting_audio'
+                }
+            else:
+                self.sessions[from_number]['last_update'] = now
+                
+            return self.sessions[from_number]
 
     def send_document(self, to_number, document_path):
         """Envia documento MIP gerado de volta para o usuário"""